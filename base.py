@@ -1,38 +1,49 @@
-from langchain_openai import ChatOpenAI
+import os
 from typing import Optional
-from pydantic import BaseModel, Field
-from tqdm import tqdm
-
-import pandas as pd
-
-CUSTOM_PROMPT = """
-    You are a trader in a large investment bank that specialize on FX derivatives. Your task is to decompose the description of the trade into the contract and all the details that are required to understand it.
-    The details should include: Instrument Type, Reference Rates, Details for each leg (Rates, Frequency, Day Count Convention), Reset Frequency for floating legs, Spreads, Notionals, Tenor, Effective Date and Maturity Data.
-    Reference rates should be stated exactly as they are in the text, do not guess them if they are not provided directly. For example 3m Term SOFR should not be stated as SOFR.
-    Remember that you consider trades from yours perspective (as a bank). So you should provide receiving and paying legs for you as a bank. It means that if the client pays, you receive, and backwards. If bank pays - then you pay, and if bank receive - you receive. If you buy swap - you receive floating leg and pay fixed, if sell - you receive fixed leg and pay floating. So you should provide floating leg and fixed leg for YOU.
-    For Cross-Currency Swaps set notional only to the legs for which it is directly provided, $ sign doesn't count for direct provision. For Floating-Fixed Swaps in 1 currency assume that legs notionals are equal.
-    If some details are not provided in the text - say that they are not provided.
-    Please think before giving an answer.
-
-    ##Trade description:
-    {trade_description}
+from pydantic import BaseModel, Field, create_model
+
+import tracing
+from cache import ResponseCache
+
+DESCRIPTION_STAGE = "description"
+STRUCTURING_STAGE = "structuring"
+SINGLE_PASS_STAGE = "single_pass"
+
+# Each call sends the static instructions of its stage as the system message and the trade alone as the user
+# message after it, so every request of a stage starts with the same tokens (see `render_prompt`)
+CUSTOM_PROMPT = """\
+You are a trader in a large investment bank that specialize on FX derivatives. Your task is to decompose the description of the trade into the contract and all the details that are required to understand it.
+The details should include: Instrument Type, Reference Rates, Details for each leg (Rates, Frequency, Day Count Convention), Reset Frequency for floating legs, Spreads, Notionals, Tenor, Effective Date and Maturity Data.
+Reference rates should be stated exactly as they are in the text, do not guess them if they are not provided directly. For example 3m Term SOFR should not be stated as SOFR.
+Remember that you consider trades from yours perspective (as a bank). So you should provide receiving and paying legs for you as a bank. It means that if the client pays, you receive, and backwards. If bank pays - then you pay, and if bank receive - you receive. If you buy swap - you receive floating leg and pay fixed, if sell - you receive fixed leg and pay floating. So you should provide floating leg and fixed leg for YOU.
+For Cross-Currency Swaps set notional only to the legs for which it is directly provided, $ sign doesn't count for direct provision. For Floating-Fixed Swaps in 1 currency assume that legs notionals are equal.
+If some details are not provided in the text - say that they are not provided.
+Please think before giving an answer.
 """
 
-STRUCTURING_PROMPT = """
-    You are a trader in a large investment bank that specialize on FX derivatives.
-    Your task is to transform the description of the FX Swap contract into the structured JSON object. 
-    You are on the side of the bank, so you should consider paying and receiving leg from your perspective.
-    For reference indexes please include the entire name, f.e. 6M SOFT or 3M EURIBOR, do not truncate that.
-    
-    Here are the fields that you should include:
-    ['EffectiveDate', 'MaturityDate', 'TenorYears', 'PayLegNotional', 'PayLegCcy', 'PayLegFreqMonths', 'PayLegBasis', 'PayLegFloatIndex', 'PayLegFloatSpreadBp', 'PayLegFixedRatePct', 'RecLegNotional', 'RecLegCcy', 'RecLegFreqMonths', 'RecLegBasis', 'RecLegFloatIndex', 'RecLegFloatSpreadBp', 'RecLegFixedRatePct']
+STRUCTURING_PROMPT = """\
+You are a trader in a large investment bank that specialize on FX derivatives.
+Your task is to transform the description of the FX Swap contract into the structured JSON object.
+You are on the side of the bank, so you should consider paying and receiving leg from your perspective.
+For reference indexes please include the entire name, f.e. 6M SOFT or 3M EURIBOR, do not truncate that.
 
-    If there are no information provided on the certain field - set it to None.
+Here are the fields that you should include:
+['EffectiveDate', 'MaturityDate', 'TenorYears', 'PayLegNotional', 'PayLegCcy', 'PayLegFreqMonths', 'PayLegBasis', 'PayLegFloatIndex', 'PayLegFloatSpreadBp', 'PayLegFixedRatePct', 'RecLegNotional', 'RecLegCcy', 'RecLegFreqMonths', 'RecLegBasis', 'RecLegFloatIndex', 'RecLegFloatSpreadBp', 'RecLegFixedRatePct']
 
-    ##Trade description:
-    {trade_description}
+If there are no information provided on the certain field - set it to None.
 """
 
+SINGLE_PASS_PROMPT = """\
+You are a trader in a large investment bank that specialize on FX derivatives.
+Your task is to transform the description of the swap trade directly into the structured JSON object.
+If the object has a Scratchpad field, first use it to briefly decompose the trade: instrument type, reference rates, and for each leg the rate, frequency, day count convention, spread and notional.
+Remember that you consider trades from yours perspective (as a bank). So you should provide receiving and paying legs for you as a bank. It means that if the client pays, you receive, and backwards. If bank pays - then you pay, and if bank receive - you receive. If you buy swap - you receive floating leg and pay fixed, if sell - you receive fixed leg and pay floating.
+For Cross-Currency Swaps set notional only to the legs for which it is directly provided, $ sign doesn't count for direct provision. For Floating-Fixed Swaps in 1 currency assume that legs notionals are equal.
+Reference rates should be stated exactly as they are in the text, do not guess them if they are not provided directly. For example 3m Term SOFR should not be stated as SOFR. Include the entire name, f.e. 6M SOFR or 3M EURIBOR, do not truncate that.
+If there are no information provided on the certain field - set it to None.
+"""
+
+TRADE_PROMPT = "##Trade description:\n{trade_description}"
 
 test_data = [
     {
@@ -339,15 +350,129 @@ class Swap(BaseModel):
     RecLegFloatSpreadBp: Optional[str] = Field(description="The spread added to the floating rate on the receive leg, expressed in basis points (bps). Leave None if the receive leg is fixed.")
     RecLegFixedRatePct: Optional[str] = Field(description="The fixed interest rate on the receive leg, expressed as a percentage. For example 3.45. Leave None if the receiving leg is floating")
 
+SwapWithScratchpad = create_model(
+    'SwapWithScratchpad',
+    Scratchpad=(Optional[str], Field(default=None, description="Short step-by-step decomposition of the trade, written before the other fields.")),
+    **{name: (field.annotation, field) for name, field in Swap.model_fields.items()},
+)
+
+# Same fields with trimmed descriptions: the schema is sent with every structured call
+COMPACT_DESCRIPTIONS = {
+    'EffectiveDate': "Start date, MM/DD/YYYY.",
+    'MaturityDate': "End date, MM/DD/YYYY.",
+    'TenorYears': "Length in years, a fraction for months.",
+    'PayLegNotional': "Pay leg principal as a number (10M -> 10000000).",
+    'PayLegCcy': "Pay leg currency, ISO code.",
+    'PayLegFreqMonths': "Pay leg payment frequency in months.",
+    'PayLegBasis': "Pay leg day count, e.g. Act/360.",
+    'PayLegFloatIndex': "Pay leg floating index exactly as written, e.g. 3M SOFR. None if fixed.",
+    'PayLegFloatSpreadBp': "Pay leg spread over the index in bp. None if fixed.",
+    'PayLegFixedRatePct': "Pay leg fixed rate in percent, e.g. 3.45. None if floating.",
+    'RecLegNotional': "Receive leg principal as a number (10M -> 10000000).",
+    'RecLegCcy': "Receive leg currency, ISO code.",
+    'RecLegFreqMonths': "Receive leg payment frequency in months.",
+    'RecLegBasis': "Receive leg day count, e.g. Act/360.",
+    'RecLegFloatIndex': "Receive leg floating index exactly as written, e.g. 3M SOFR. None if fixed.",
+    'RecLegFloatSpreadBp': "Receive leg spread over the index in bp. None if fixed.",
+    'RecLegFixedRatePct': "Receive leg fixed rate in percent, e.g. 3.45. None if floating.",
+}
+
+CompactSwap = create_model(
+    'CompactSwap',
+    **{name: (field.annotation, Field(description=COMPACT_DESCRIPTIONS[name]))
+       for name, field in Swap.model_fields.items()},
+)
+
+CompactSwapWithScratchpad = create_model(
+    'CompactSwapWithScratchpad',
+    Scratchpad=(Optional[str], Field(default=None, description="Short decomposition of the trade, written first.")),
+    **{name: (field.annotation, field) for name, field in CompactSwap.model_fields.items()},
+)
+
+
+def output_schema(scratchpad: bool = False):
+    """Schema of the structured models: `Swap` or, after `configure(compact=True)`, `CompactSwap`."""
+    if compact_schema:
+        return CompactSwapWithScratchpad if scratchpad else CompactSwap
+    return SwapWithScratchpad if scratchpad else Swap
+
+
+def as_swap(output) -> Swap:
+    """The `Swap` fields of a structured model's output, whichever schema it was asked for."""
+    return output if isinstance(output, Swap) else Swap(**output.model_dump(include=set(Swap.model_fields)))
+
+
+def render_prompt(instructions: str, trade_description: str) -> list:
+    """Chat messages of one call: the stage's static `instructions`, then the trade text."""
+    return [('system', instructions), ('human', TRADE_PROMPT.format(trade_description=trade_description))]
+
+
+def predict(trade, cache: Optional[ResponseCache] = None) -> Swap:
+    chat, structured = get_model('chat_description'), get_model('structured_model')
+    description_prompt = render_prompt(CUSTOM_PROMPT, trade)
+    trade_description = cache.lookup(DESCRIPTION_STAGE, chat, description_prompt) if cache is not None else None
+    if trade_description is None:
+        trade_description = tracing.invoke(chat, description_prompt, DESCRIPTION_STAGE).content
+        if cache is not None:
+            cache.store(DESCRIPTION_STAGE, chat, description_prompt, trade_description)
 
-def predict(trade) -> Swap:
-    trade_description = chat_description.invoke(CUSTOM_PROMPT.format(trade_description=trade)).content
-    swap = structured_model.invoke(STRUCTURING_PROMPT.format(trade_description=trade_description))
+    structuring_prompt = render_prompt(STRUCTURING_PROMPT, trade_description)
+    schema = output_schema()
+    cached = cache.lookup(STRUCTURING_STAGE, structured, structuring_prompt, schema=schema) if cache is not None else None
+    if cached is not None:
+        return Swap.model_validate_json(cached)
+    swap = as_swap(tracing.invoke(structured, structuring_prompt, STRUCTURING_STAGE))
+    if cache is not None:
+        cache.store(STRUCTURING_STAGE, structured, structuring_prompt, swap.model_dump_json(), schema=schema)
     return swap
 
+async def apredict(trade, cache: Optional[ResponseCache] = None) -> Swap:
+    chat, structured = get_model('chat_description'), get_model('structured_model')
+    description_prompt = render_prompt(CUSTOM_PROMPT, trade)
+    trade_description = cache.lookup(DESCRIPTION_STAGE, chat, description_prompt) if cache is not None else None
+    if trade_description is None:
+        trade_description = (await tracing.ainvoke(chat, description_prompt, DESCRIPTION_STAGE)).content
+        if cache is not None:
+            cache.store(DESCRIPTION_STAGE, chat, description_prompt, trade_description)
+
+    structuring_prompt = render_prompt(STRUCTURING_PROMPT, trade_description)
+    schema = output_schema()
+    cached = cache.lookup(STRUCTURING_STAGE, structured, structuring_prompt, schema=schema) if cache is not None else None
+    if cached is not None:
+        return Swap.model_validate_json(cached)
+    swap = as_swap(await tracing.ainvoke(structured, structuring_prompt, STRUCTURING_STAGE))
+    if cache is not None:
+        cache.store(STRUCTURING_STAGE, structured, structuring_prompt, swap.model_dump_json(), schema=schema)
+    return swap
+
+def predict_single_pass(trade, cache: Optional[ResponseCache] = None, scratchpad: bool = True,
+                        model: Optional[str] = None) -> Swap:
+    model = get_model(model or ('single_pass_model' if scratchpad else 'structured_model'))
+    schema = output_schema(scratchpad)
+    prompt = render_prompt(SINGLE_PASS_PROMPT, trade)
+    cached = cache.lookup(SINGLE_PASS_STAGE, model, prompt, schema=schema) if cache is not None else None
+    swap = (schema.model_validate_json(cached) if cached is not None
+            else tracing.invoke(model, prompt, SINGLE_PASS_STAGE))
+    if cache is not None and cached is None:
+        cache.store(SINGLE_PASS_STAGE, model, prompt, swap.model_dump_json(), schema=schema)
+    return as_swap(swap)
+
+async def apredict_single_pass(trade, cache: Optional[ResponseCache] = None, scratchpad: bool = True,
+                               model: Optional[str] = None) -> Swap:
+    model = get_model(model or ('single_pass_model' if scratchpad else 'structured_model'))
+    schema = output_schema(scratchpad)
+    prompt = render_prompt(SINGLE_PASS_PROMPT, trade)
+    cached = cache.lookup(SINGLE_PASS_STAGE, model, prompt, schema=schema) if cache is not None else None
+    swap = (schema.model_validate_json(cached) if cached is not None
+            else await tracing.ainvoke(model, prompt, SINGLE_PASS_STAGE))
+    if cache is not None and cached is None:
+        cache.store(SINGLE_PASS_STAGE, model, prompt, swap.model_dump_json(), schema=schema)
+    return as_swap(swap)
+
 def parse_swap(swap: dict) -> dict:
     if swap['TenorYears'] is not None:
-        swap['TenorYears'] = int(swap['TenorYears'])
+        tenor = float(swap['TenorYears'])
+        swap['TenorYears'] = int(tenor) if tenor.is_integer() else tenor
     if swap['PayLegNotional'] is not None:
         swap['PayLegNotional'] = int(swap['PayLegNotional'])
     if swap['RecLegNotional'] is not None:
@@ -361,8 +486,6 @@ def parse_swap(swap: dict) -> dict:
             swap['PayLegFloatSpreadBp'] = float(swap['PayLegFloatSpreadBp'])
     if swap['PayLegFixedRatePct'] is not None:
         swap['PayLegFixedRatePct'] = float(swap['PayLegFixedRatePct'])
-    if swap['RecLegNotional'] is not None:
-        swap['RecLegNotional'] = int(swap['RecLegNotional'])
     if swap['RecLegFreqMonths'] is not None:
         swap['RecLegFreqMonths'] = int(swap['RecLegFreqMonths'])
     if swap['RecLegFloatSpreadBp'] is not None:
@@ -386,24 +509,81 @@ def score(predict, golden) -> dict:
     
     return results
 
-openai_api_key = "<your-key>"
-chat_description = ChatOpenAI(temperature=0.5, model="gpt-4o", openai_api_key=openai_api_key)
-chat_structured = ChatOpenAI(temperature=0, model='gpt-4o', openai_api_key=openai_api_key)
+# The chat models are built on first use (see `get_model`), so importing this module stays cheap and
+# never needs langchain. Call `configure` before the first prediction to change the model or the key.
+openai_api_key = os.environ.get("OPENAI_API_KEY", "<your-key>")
+model_name = "gpt-4o"
+# First tier of the cascade (see `cascade`): a smaller model answering in a single structured call
+cheap_model_name = "gpt-4o-mini"
+# Structured models answer in `CompactSwap` rather than `Swap` (see `output_schema`)
+compact_schema = False
+# Retries made by the OpenAI client itself on every call; runs driven by `retry.Retrier` turn them off
+client_max_retries = 2
+MODEL_NAMES = ('chat_description', 'chat_structured', 'structured_model', 'single_pass_model', 'chat_cheap',
+               'cheap_model')
+
+
+def _build_model(name):
+    if name == 'chat_description':
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(temperature=0.5, model=model_name, openai_api_key=openai_api_key,
+                          max_retries=client_max_retries)
+    if name == 'chat_structured':
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(temperature=0, model=model_name, openai_api_key=openai_api_key,
+                          max_retries=client_max_retries)
+    if name == 'structured_model':
+        return get_model('chat_structured').with_structured_output(output_schema())
+    if name == 'single_pass_model':
+        return get_model('chat_structured').with_structured_output(output_schema(scratchpad=True))
+    if name == 'chat_cheap':
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(temperature=0, model=cheap_model_name, openai_api_key=openai_api_key,
+                          max_retries=client_max_retries)
+    if name == 'cheap_model':
+        return get_model('chat_cheap').with_structured_output(output_schema(scratchpad=True))
+    raise KeyError(name)
 
-structured_model = chat_structured.with_structured_output(Swap)
+
+def get_model(name):
+    """The chat model stored under `name`, building it on first use. Assigning `base.<name>` overrides it."""
+    model = globals().get(name)
+    if model is None:
+        model = globals()[name] = _build_model(name)
+    return model
+
+
+def configure(model: Optional[str] = None, api_key: Optional[str] = None, cheap_model: Optional[str] = None,
+              compact: Optional[bool] = None, client_retries: Optional[int] = None):
+    """
+    Change the model names, API key, schema variant or client retries; models already built are dropped and
+    rebuilt on next use.
+    """
+    global model_name, openai_api_key, cheap_model_name, compact_schema, client_max_retries
+    if (model in (None, model_name) and api_key in (None, openai_api_key)
+            and cheap_model in (None, cheap_model_name) and compact in (None, compact_schema)
+            and client_retries in (None, client_max_retries)):
+        return
+    model_name = model if model is not None else model_name
+    openai_api_key = api_key if api_key is not None else openai_api_key
+    cheap_model_name = cheap_model if cheap_model is not None else cheap_model_name
+    compact_schema = compact if compact is not None else compact_schema
+    client_max_retries = client_retries if client_retries is not None else client_max_retries
+    for name in MODEL_NAMES:
+        globals().pop(name, None)
+
+
+def __getattr__(name):
+    if name in MODEL_NAMES:
+        return get_model(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 ## Testing pipeline ~2 min
-# scores = {}
-# for trade in tqdm(test_data):
-#     trade_description = trade['trade_description']
-#     swap = predict(trade)
-#     print(swap)
-#     swap = parse_swap(swap.dict())
-#     ground_truth = trade.get('ground_truth', {})
-#     scores[trade_description] = score(swap, ground_truth)
-
-# accuracy_dict = {k: sum(v.values())/len(v) for k, v in scores.items()}
-# total_score = sum([sum(values) for values in accuracy_dict.values()]) / sum([len(values) for values in accuracy_dict.values()])
+# from evaluation import evaluate, test_data_frame
+# from tqdm import tqdm
+# predictions = [parse_swap(predict(trade['trade_description']).dict()) for trade in tqdm(test_data)]
+# report = evaluate(predictions, test_data_frame())
+# accuracy_dict, total_score = report['field_accuracy'], report['overall_accuracy']
 def swap_to_record(swap: dict, id, text):
     return {
         'solution': 'ExpectedResults',
@@ -429,18 +609,3 @@ def swap_to_record(swap: dict, id, text):
         'rec_leg_float_spread_bp': swap['RecLegFloatSpreadBp'],
         'rec_leg_fixed_rate_pct': swap['RecLegFixedRatePct']
     }
-
-## Predict
-input_path = "./HackathonOutput.csv"
-df = pd.read_csv(input_path)
-
-results = []
-for index, row in tqdm(df.iterrows()):
-    trade_description = row['entry_text']
-    swap = predict(trade_description)
-    swap = parse_swap(swap.dict())
-    record = swap_to_record(swap, index, trade_description)
-    results.append(record)
-
-results_df = pd.DataFrame(results)
-results_df.to_csv('HackathonOutput.csv', index=False)
\ No newline at end of file
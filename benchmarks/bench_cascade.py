@@ -0,0 +1,89 @@
+"""
+Cheap-model cascade against the plain two-call `predict()` pipeline on `test_data`.
+
+    python -m benchmarks.bench_cascade                 # live models, needs a valid key in $OPENAI_API_KEY
+    python -m benchmarks.bench_cascade --fake --latency 1.5 --cheap-latency 0.4 --cheap-error-rate 0.3
+
+Reports the escalation rate and the validation problems that caused it, per-field accuracy from `score()`
+for both pipelines, and the mean latency of each cascade tier (the full tier only over escalated trades).
+"""
+import argparse
+import collections
+import json
+import statistics
+import time
+from contextlib import nullcontext
+
+from base import Swap, parse_swap, predict, score, test_data
+from cascade import CHEAP_TIER, FULL_TIER, run_cascade
+from fake_models import fake_models
+
+
+def accuracy(swaps) -> dict:
+    field_scores = collections.defaultdict(list)
+    for swap, trade in zip(swaps, test_data):
+        for field, value in score(parse_swap(swap.model_dump()), trade['ground_truth']).items():
+            field_scores[field].append(value)
+    return {field: statistics.mean(values) for field, values in field_scores.items()}
+
+
+def run_baseline() -> dict:
+    swaps, latencies = [], []
+    for trade in test_data:
+        start = time.perf_counter()
+        swaps.append(predict(trade['trade_description']))
+        latencies.append(time.perf_counter() - start)
+    return {'field_accuracy': accuracy(swaps), 'latency_mean': statistics.mean(latencies)}
+
+
+def run_tiered() -> dict:
+    results = [run_cascade(trade['trade_description']) for trade in test_data]
+    escalated = [result for result in results if result.tier == FULL_TIER]
+    problems = collections.Counter(problem.split(':')[0] for result in escalated for problem in result.problems)
+    return {
+        'field_accuracy': accuracy([result.swap for result in results]),
+        'latency_mean': statistics.mean(sum(result.seconds.values()) for result in results),
+        'escalation_rate': len(escalated) / len(results),
+        'tier_latency_mean': {
+            CHEAP_TIER: statistics.mean(result.seconds[CHEAP_TIER] for result in results),
+            FULL_TIER: statistics.mean(result.seconds[FULL_TIER] for result in escalated) if escalated else None,
+        },
+        'escalation_reasons': dict(problems.most_common()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fake', action='store_true', help="use the local fake models instead of the live endpoint")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per fake full-tier model call")
+    parser.add_argument('--cheap-latency', type=float, default=None, help="seconds per fake cheap-tier call")
+    parser.add_argument('--cheap-error-rate', type=float, default=0.3,
+                        help="fraction of trades the fake cheap tier gets inconsistent")
+    parser.add_argument('--json', action='store_true', help="print the raw report as JSON")
+    args = parser.parse_args()
+
+    fakes = fake_models(latency=args.latency, cheap_latency=args.cheap_latency,
+                        cheap_error_rate=args.cheap_error_rate) if args.fake else nullcontext()
+    with fakes:
+        report = {'two_pass': run_baseline(), 'cascade': run_tiered()}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'field':<36}" + "".join(f"{mode:>12}" for mode in report))
+    for field in Swap.model_fields:
+        print(f"{field:<36}" + "".join(f"{r['field_accuracy'][field]:>12.2f}" for r in report.values()))
+    total = {mode: statistics.mean(r['field_accuracy'].values()) for mode, r in report.items()}
+    print(f"{'overall accuracy':<36}" + "".join(f"{value:>12.3f}" for value in total.values()))
+    print(f"{'latency_mean':<36}" + "".join(f"{r['latency_mean']:>12.2f}" for r in report.values()))
+
+    cascade = report['cascade']
+    print(f"\nescalation rate {cascade['escalation_rate']:.0%}")
+    for tier, seconds in cascade['tier_latency_mean'].items():
+        print(f"  {tier:<6} tier mean latency {'n/a' if seconds is None else f'{seconds:.2f} s'}")
+    for reason, count in cascade['escalation_reasons'].items():
+        print(f"  {count:>4}  {reason}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Throughput of the async prediction engine against the local fake models.
+
+    python -m benchmarks.bench_concurrency --rows 200 --latency 0.2
+
+Rows cycle through `test_data`, so deduplication is off. Each row costs two fake calls of `--latency`
+seconds, so the sequential loop runs at ~1 / (2 * latency) rows/sec and throughput should grow roughly
+linearly with concurrency.
+"""
+import argparse
+import time
+
+from base import test_data
+from engine import predict_rows
+from fake_models import fake_models
+
+
+def run(rows, concurrency, latency) -> float:
+    with fake_models(latency=latency):
+        start = time.perf_counter()
+        records = predict_rows(rows, concurrency=concurrency, dedupe=False, progress=False)
+        elapsed = time.perf_counter() - start
+    assert [record['trade_id'] for record in records] == [trade_id for trade_id, _ in rows]
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.2, help="seconds per fake model call")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    rows = [(i, test_data[i % len(test_data)]['trade_description']) for i in range(args.rows)]
+    print(f"{'concurrency':>11} {'seconds':>9} {'rows/sec':>9} {'speedup':>8}")
+    baseline = None
+    for concurrency in args.concurrency:
+        elapsed = run(rows, concurrency, args.latency)
+        throughput = len(rows) / elapsed
+        baseline = baseline or throughput
+        print(f"{concurrency:>11} {elapsed:>9.2f} {throughput:>9.1f} {throughput / baseline:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Coverage and accuracy of the rule-based fast path.
+
+    python -m benchmarks.bench_fast_path --llm-latency 6.0
+
+Reports the fast-path hit rate on `test_data` and on the entries of an input CSV, per-field accuracy
+(via `score()`) of the rows the fast path claims, and the latency saved per row against the LLM path.
+`--llm-latency` is the measured mean seconds of a two-stage `predict()` call on your deployment.
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from base import parse_swap, score, test_data
+from fast_path import extract
+
+
+def timed_extract(text):
+    start = time.perf_counter()
+    result = extract(text)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', default='./HackathonOutput.csv')
+    parser.add_argument('--llm-latency', type=float, default=6.0, help="mean seconds of one predict() call")
+    args = parser.parse_args()
+
+    field_scores = {}
+    exact = 0
+    hits, elapsed = 0, 0.0
+    for trade in test_data:
+        result, seconds = timed_extract(trade['trade_description'])
+        elapsed += seconds
+        if not result.confident:
+            continue
+        hits += 1
+        scores = score(parse_swap(result.swap.model_dump()), trade['ground_truth'])
+        exact += all(scores.values())
+        for field, value in scores.items():
+            field_scores.setdefault(field, []).append(value)
+
+    print(f"test_data: {hits}/{len(test_data)} rows on the fast path ({hits / len(test_data):.0%}), "
+          f"{exact}/{hits} exact matches")
+    for field, values in field_scores.items():
+        print(f"  {field:<22} {sum(values) / len(values):.2f}")
+
+    texts = pd.read_csv(args.input)['entry_text'].tolist()
+    csv_hits = 0
+    for text in texts:
+        result, seconds = timed_extract(text)
+        elapsed += seconds
+        csv_hits += result.confident
+    print(f"{args.input}: {csv_hits}/{len(texts)} rows on the fast path ({csv_hits / len(texts):.0%})")
+
+    total = len(test_data) + len(texts)
+    fast_latency = elapsed / total
+    hit_rate = (hits + csv_hits) / total
+    print(f"fast path latency: {fast_latency * 1e6:.0f} us/row, "
+          f"saved per fast-path row: {args.llm_latency - fast_latency:.2f} s, "
+          f"saved per input row on average: {hit_rate * (args.llm_latency - fast_latency):.2f} s")
+
+
+if __name__ == '__main__':
+    main()
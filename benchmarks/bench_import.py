@@ -0,0 +1,50 @@
+"""
+Cold import time of the library modules, each measured in a fresh interpreter.
+
+    python -m benchmarks.bench_import --budget 0.25
+
+Fails (exit code 1) when the best of `--repeat` runs exceeds the budget, or when importing pulls in one of
+the heavy dependencies that are supposed to be deferred until a model is built or a batch is run.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ['langchain_openai', 'langchain_core', 'openai', 'pandas']
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str) -> dict:
+    output = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', nargs='+', default=['base', 'fast_path'])
+    parser.add_argument('--budget', type=float, default=0.25, help="seconds allowed per cold import")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.repeat)]
+        best = min(run['seconds'] for run in runs)
+        heavy = runs[0]['heavy']
+        ok = best <= args.budget and not heavy
+        failed |= not ok
+        print(f"{module:<12} {best * 1000:7.1f} ms (budget {args.budget * 1000:.0f} ms)"
+              f"{'  heavy imports: ' + ', '.join(heavy) if heavy else ''}  {'ok' if ok else 'FAIL'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
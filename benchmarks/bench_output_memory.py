@@ -0,0 +1,100 @@
+"""
+Peak memory and wall time of the output paths for a batch of N records.
+
+    python -m benchmarks.bench_output_memory --rows 10000 100000 1000000
+
+- `dataframe`: the original path, accumulating every record in a list and calling `pd.DataFrame(results).to_csv`,
+- `csv`: `streaming.CheckpointedCsvWriter`, appending one row at a time,
+- `parquet`: `columnar.ParquetRecordWriter`, typed Arrow record batches written incrementally.
+
+Each measurement runs in a fresh interpreter and reports the growth of peak RSS over the baseline after imports.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+METHODS = ['dataframe', 'csv', 'parquet']
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+def records(n: int):
+    from base import parse_swap, swap_to_record, test_data
+    from fake_models import canned_swaps
+
+    swaps = [parse_swap(swap.model_dump()) for swap in canned_swaps().values()]
+    for i in range(n):
+        yield swap_to_record(swaps[i % len(swaps)], i, test_data[i % len(test_data)]['trade_description'])
+
+
+def child(method: str, n: int, path: str):
+    import pandas as pd
+    import pyarrow  # noqa: F401  imported up front so every method starts from the same baseline
+
+    from columnar import ParquetRecordWriter
+    from streaming import CheckpointedCsvWriter
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if method == 'dataframe':
+        results = []
+        for record in records(n):
+            results.append(record)
+        pd.DataFrame(results).to_csv(path, index=False)
+    else:
+        writer = CheckpointedCsvWriter(path, fsync_every=1000) if method == 'csv' else ParquetRecordWriter(path)
+        with writer:
+            for record in records(n):
+                writer.write(record)
+    elapsed = time.perf_counter() - start
+    if os.path.isdir(path):
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    else:
+        size = os.path.getsize(path)
+    print(json.dumps({'method': method, 'rows': n, 'seconds': elapsed,
+                      'peak_rss_growth_mb': peak_rss_mb() - baseline, 'output_mb': size / 2 ** 20}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--methods', nargs='+', choices=METHODS, default=METHODS)
+    parser.add_argument('--child', nargs=3, metavar=('METHOD', 'ROWS', 'PATH'), help=argparse.SUPPRESS)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], int(args.child[1]), args.child[2])
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n in args.rows:
+            for method in args.methods:
+                path = os.path.join(directory, f'{method}_{n}')
+                output = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.bench_output_memory', '--child', method, str(n), path],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                results.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'method':<10} {'rows':>9} {'seconds':>8} {'peak RSS +MB':>13} {'output MB':>10}")
+    for result in results:
+        print(f"{result['method']:<10} {result['rows']:>9} {result['seconds']:>8.2f} "
+              f"{result['peak_rss_growth_mb']:>13.1f} {result['output_mb']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
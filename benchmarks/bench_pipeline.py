@@ -0,0 +1,185 @@
+"""
+Offline benchmark of the batch pipeline against the local fake models.
+
+    python -m benchmarks.bench_pipeline --rows 1000 10000 100000 1000000 --latency lognormal:0.02,0.5 --out bench.json
+
+For every batch size a synthetic input CSV is generated and run end to end through `run_streaming` with
+both chat models replaced by fakes sampling latency from `--latency` ('constant:s', 'uniform:lo,hi' or
+'lognormal:median,sigma'). The input cycles through `test_data`, so deduplication is off and every row costs its
+own model calls. Reported as JSON so runs can be diffed for regressions:
+
+- end-to-end wall time and rows/sec,
+- p50/p95/p99 latency of each stage and of each whole trade,
+- time spent in per-row `parse_swap`, batched `normalize_swaps`, `swap_to_record`, and CSV reading/writing,
+  measured on the same batch size.
+
+Sizes above `--e2e-max-rows` only get the CPU-side measurements, which do not depend on model latency.
+"""
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import base
+from base import apredict, parse_swap, swap_to_record, test_data
+from fake_models import canned_swaps, fake_models
+from normalize import normalize_swaps, to_records
+from streaming import CheckpointedCsvWriter, run_streaming
+
+CHUNK = 10000
+
+
+class StageTimer:
+    """Wraps a chat model and records the wall time of every call into `samples`."""
+
+    def __init__(self, model, samples: list):
+        self.model = model
+        self.samples = samples
+
+    def invoke(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.model.invoke(*args, **kwargs)
+        finally:
+            self.samples.append(time.perf_counter() - start)
+
+    async def ainvoke(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await self.model.ainvoke(*args, **kwargs)
+        finally:
+            self.samples.append(time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {}
+    values = np.asarray(samples)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'count': len(values), 'mean': float(values.mean()), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+
+def texts(n: int):
+    return itertools.islice(itertools.cycle([trade['trade_description'] for trade in test_data]), n)
+
+
+def write_input(path: str, n: int):
+    pd.DataFrame({'trade_id': range(1, n + 1), 'entry_text': list(texts(n))}).to_csv(path, index=False)
+
+
+def bench_end_to_end(input_path: str, output_path: str, latency, concurrency: int, chunksize: int) -> dict:
+    stages = {'description': [], 'structuring': [], 'trade': []}
+    with fake_models(latency=latency):
+        base.chat_description = StageTimer(base.chat_description, stages['description'])
+        base.structured_model = StageTimer(base.structured_model, stages['structuring'])
+
+        async def timed_predict(trade, cache=None):
+            start = time.perf_counter()
+            swap = await apredict(trade, cache=cache)
+            stages['trade'].append(time.perf_counter() - start)
+            return swap
+
+        start = time.perf_counter()
+        stats = run_streaming(input_path, output_path, chunksize=chunksize, concurrency=concurrency,
+                              predict_fn=timed_predict, dedupe=False, progress=False)
+        elapsed = time.perf_counter() - start
+    return {
+        'seconds': elapsed,
+        'rows_per_sec': stats['written'] / elapsed,
+        'latency': {stage: percentiles(samples) for stage, samples in stages.items()},
+    }
+
+
+def bench_postprocessing(n: int) -> dict:
+    swaps = [swap.model_dump() for swap in canned_swaps().values()]
+    parse_seconds = normalize_seconds = record_seconds = 0.0
+    for offset in range(0, n, CHUNK):
+        size = min(CHUNK, n - offset)
+        batch = [dict(swaps[i % len(swaps)]) for i in range(size)]
+        # parse_swap converts the dicts in place, so the batched path gets the raw values from its own copies
+        raw = [dict(swap) for swap in batch]
+        start = time.perf_counter()
+        parsed = [parse_swap(swap) for swap in batch]
+        parse_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        to_records(normalize_swaps(raw)[0])
+        normalize_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        for i, (swap, text) in enumerate(zip(parsed, texts(size))):
+            swap_to_record(swap, offset + i, text)
+        record_seconds += time.perf_counter() - start
+    return {'parse_swap_seconds': parse_seconds, 'normalize_swaps_seconds': normalize_seconds,
+            'swap_to_record_seconds': record_seconds}
+
+
+def bench_csv_io(input_path: str, output_path: str, n: int) -> dict:
+    start = time.perf_counter()
+    for _ in pd.read_csv(input_path, chunksize=CHUNK):
+        pass
+    read_seconds = time.perf_counter() - start
+
+    swaps = [parse_swap(swap.model_dump()) for swap in canned_swaps().values()]
+    write_seconds = 0.0
+    writer = CheckpointedCsvWriter(output_path, fsync_every=1000)
+    for offset in range(0, n, CHUNK):
+        size = min(CHUNK, n - offset)
+        records = [swap_to_record(swaps[i % len(swaps)], offset + i, text) for i, text in enumerate(texts(size))]
+        start = time.perf_counter()
+        for record in records:
+            writer.write(record)
+        write_seconds += time.perf_counter() - start
+    start = time.perf_counter()
+    writer.close()
+    write_seconds += time.perf_counter() - start
+    return {'csv_read_seconds': read_seconds, 'csv_write_seconds': write_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--latency', default='lognormal:0.02,0.5', help="fake model latency distribution")
+    parser.add_argument('--concurrency', type=int, default=256)
+    parser.add_argument('--chunksize', type=int, default=5000)
+    parser.add_argument('--e2e-max-rows', type=int, default=100000)
+    parser.add_argument('--out', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n in args.rows:
+            input_path = os.path.join(directory, f'input_{n}.csv')
+            write_input(input_path, n)
+            result = {'rows': n}
+            if n <= args.e2e_max_rows:
+                output_path = os.path.join(directory, f'output_{n}.csv')
+                result['end_to_end'] = bench_end_to_end(input_path, output_path, args.latency,
+                                                        args.concurrency, args.chunksize)
+            result.update(bench_postprocessing(n))
+            result.update(bench_csv_io(input_path, os.path.join(directory, f'io_{n}.csv'), n))
+            for key in ('parse_swap_seconds', 'normalize_swaps_seconds', 'swap_to_record_seconds',
+                        'csv_read_seconds', 'csv_write_seconds'):
+                result[key.replace('_seconds', '_us_per_row')] = result[key] / n * 1e6
+            results.append(result)
+
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key != 'out'},
+        'results': results,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Prompt size per trade with the full and the compact (`base.CompactSwap`) schema, and accuracy on `test_data`
+with each, so that trimming the field descriptions can be checked not to cost accuracy.
+
+    python -m benchmarks.bench_prompt_size            # live models, needs a valid key in $OPENAI_API_KEY
+    python -m benchmarks.bench_prompt_size --fake     # token counts plus an offline plumbing check
+
+Every call sends its stage's static instructions and schema first and the trade last (see `base.render_prompt`),
+so the static part is a prefix shared by all trades that provider-side prompt caching can reuse. OpenAI only
+caches prompts of at least `CACHE_MIN_TOKENS` tokens, which the report flags per stage. Token counts use the
+o200k tokenizer when tiktoken has it available and `engine.estimate_tokens` otherwise; the structuring stage
+is counted without the stage 1 decomposition it receives, which only the billed tokens of a live run include.
+"""
+import argparse
+import collections
+import json
+import statistics
+from contextlib import nullcontext
+
+from langchain_core.callbacks import get_usage_metadata_callback
+
+import base
+from base import (CUSTOM_PROMPT, SINGLE_PASS_PROMPT, STRUCTURING_PROMPT, TRADE_PROMPT, Swap, parse_swap, predict,
+                  predict_single_pass, score, test_data)
+from engine import estimate_tokens
+from fake_models import fake_models
+
+CACHE_MIN_TOKENS = 1024
+VARIANTS = {'full': False, 'compact': True}
+STAGES = {
+    base.DESCRIPTION_STAGE: (CUSTOM_PROMPT, None),
+    base.STRUCTURING_STAGE: (STRUCTURING_PROMPT, False),
+    base.SINGLE_PASS_STAGE: (SINGLE_PASS_PROMPT, True),
+}
+MODES = {'two_pass': predict, 'single_pass': predict_single_pass}
+
+
+def tokenizer():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding('o200k_base')
+    except Exception:  # not installed, or the encoding cannot be downloaded
+        return estimate_tokens, 'estimated'
+    return lambda text: len(encoding.encode(text)), 'o200k_base'
+
+
+def prompt_sizes(count_tokens) -> dict:
+    """Static prefix and mean per-trade tokens of every stage, per schema variant."""
+    trade_tokens = statistics.mean(count_tokens(TRADE_PROMPT.format(trade_description=trade['trade_description']))
+                                   for trade in test_data)
+    sizes = {}
+    for variant, compact in VARIANTS.items():
+        base.configure(compact=compact)
+        for stage, (instructions, scratchpad) in STAGES.items():
+            schema = 0
+            if scratchpad is not None:
+                schema = count_tokens(json.dumps(base.output_schema(scratchpad).model_json_schema()))
+            static = count_tokens(instructions) + schema
+            sizes[variant, stage] = {'schema': schema, 'static': static, 'per_trade': trade_tokens,
+                                     'cacheable_share': static / (static + trade_tokens)}
+    base.configure(compact=False)
+    return sizes
+
+
+def run_accuracy(mode: str, compact: bool, fake: bool) -> dict:
+    # Configured first: `configure` drops the models already built, fakes included
+    base.configure(compact=compact)
+    field_scores = collections.defaultdict(list)
+    with fake_models() if fake else nullcontext(), get_usage_metadata_callback() as usage:
+        for trade in test_data:
+            swap = MODES[mode](trade['trade_description'])
+            for field, value in score(parse_swap(swap.model_dump()), trade['ground_truth']).items():
+                field_scores[field].append(value)
+    base.configure(compact=False)
+    billed = sum(model_usage.get('input_tokens', 0) for model_usage in usage.usage_metadata.values())
+    return {
+        'field_accuracy': {field: statistics.mean(values) for field, values in field_scores.items()},
+        'billed_input_tokens_per_trade': billed / len(test_data),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fake', action='store_true', help="use the local fake models instead of the live endpoint")
+    parser.add_argument('--json', action='store_true', help="print the raw report as JSON")
+    args = parser.parse_args()
+
+    count_tokens, tokenizer_name = tokenizer()
+    sizes = prompt_sizes(count_tokens)
+    accuracy = {f"{mode}/{variant}": run_accuracy(mode, compact, args.fake)
+                for mode in MODES for variant, compact in VARIANTS.items()}
+
+    if args.json:
+        print(json.dumps({'tokenizer': tokenizer_name,
+                          'prompt_sizes': {f"{variant}/{stage}": size for (variant, stage), size in sizes.items()},
+                          'accuracy': accuracy}, indent=2))
+        return
+    print(f"Prompt tokens per call ({tokenizer_name}); prefixes under {CACHE_MIN_TOKENS} tokens are not cached")
+    print(f"{'variant':<8} {'stage':<12} {'schema':>7} {'static':>7} {'trade':>6} {'cacheable':>10}")
+    for (variant, stage), size in sizes.items():
+        flag = '' if size['static'] >= CACHE_MIN_TOKENS else '  (below cache minimum)'
+        print(f"{variant:<8} {stage:<12} {size['schema']:>7} {size['static']:>7} {size['per_trade']:>6.0f} "
+              f"{size['cacheable_share']:>10.0%}{flag}")
+
+    print(f"\n{'field':<36}" + "".join(f"{name:>20}" for name in accuracy))
+    for field in Swap.model_fields:
+        print(f"{field:<36}" + "".join(f"{r['field_accuracy'][field]:>20.2f}" for r in accuracy.values()))
+    total = [statistics.mean(r['field_accuracy'].values()) for r in accuracy.values()]
+    print(f"{'overall accuracy':<36}" + "".join(f"{value:>20.3f}" for value in total))
+    print(f"{'billed input tokens / trade':<36}"
+          + "".join(f"{r['billed_input_tokens_per_trade']:>20.0f}" for r in accuracy.values()))
+
+
+if __name__ == '__main__':
+    main()
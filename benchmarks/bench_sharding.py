@@ -0,0 +1,68 @@
+"""
+Scaling of `sharding.run_sharded` with the number of worker processes, against the local fake models.
+
+    python -m benchmarks.bench_sharding --rows 20000 --shards 1 2 4 8
+
+Every shard keeps `--concurrency-per-shard` trades in flight, with no rate limit, cache or dedup, so with the
+default zero model latency each worker is bound by its own per-row CPU work and throughput should grow
+almost linearly with the shard count, up to the number of cores. Process start-up and the final merge are
+included in the timings.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from base import test_data
+from cli import build_parser
+from fake_models import install_fake_models
+from sharding import run_sharded
+
+
+def write_input(path: str, rows: int):
+    # Numbered so rows stay distinct and take the full LLM path
+    texts = [f"{test_data[i % len(test_data)]['trade_description']} (ticket {i})" for i in range(rows)]
+    pd.DataFrame({'entry_text': texts}).to_csv(path, index=False)
+
+
+def run(input_path: str, output_path: str, shards: int, concurrency: int, latency: float) -> float:
+    args = build_parser().parse_args([
+        'run', '--input', input_path, '--output', output_path, '--shards', str(shards),
+        '--concurrency', str(concurrency * shards), '--rpm', '0', '--tpm', '0', '--cache', '',
+        '--no-dedupe', '--no-fast-path',
+    ])
+    start = time.perf_counter()
+    stats = run_sharded(args, initializer=install_fake_models, initargs=(latency,))
+    elapsed = time.perf_counter() - start
+    trade_ids = pd.read_csv(output_path, usecols=['trade_id'])['trade_id'].tolist()
+    assert stats['written'] == len(trade_ids) and trade_ids == sorted(trade_ids), "merged output out of order"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--concurrency-per-shard', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per fake model call")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'shards':>6} {'seconds':>9} {'rows/sec':>9} {'speedup':>8} {'efficiency':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'input.csv')
+        write_input(input_path, args.rows)
+        baseline = None
+        for shards in args.shards:
+            elapsed = run(input_path, os.path.join(tmp, f'output-{shards}.csv'), shards,
+                          args.concurrency_per_shard, args.latency)
+            throughput = args.rows / elapsed
+            baseline = baseline or throughput
+            speedup = throughput / baseline
+            print(f"{shards:>6} {elapsed:>9.2f} {throughput:>9.1f} {speedup:>7.1f}x {speedup / shards:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Side-by-side comparison of the two-call `predict()` pipeline and the single-call structured mode on `test_data`.
+
+    python -m benchmarks.bench_single_pass            # live models, needs a valid key in $OPENAI_API_KEY
+    python -m benchmarks.bench_single_pass --fake     # offline plumbing check with the local fake models
+
+For each mode reports per-field accuracy from `score()`, latency per trade, billed tokens from the
+models' usage metadata and an estimate of the prompt tokens each mode sends (rendered prompts + schema).
+"""
+import argparse
+import json
+import statistics
+import time
+from contextlib import nullcontext
+
+from langchain_core.callbacks import get_usage_metadata_callback
+
+import base
+from base import (CUSTOM_PROMPT, SINGLE_PASS_PROMPT, STRUCTURING_PROMPT, TRADE_PROMPT, Swap, SwapWithScratchpad,
+                  parse_swap, predict, predict_single_pass, score, test_data)
+from engine import estimate_tokens, schema_tokens
+from fake_models import fake_models
+
+MODES = {
+    'two_pass': predict,
+    'single_pass': predict_single_pass,
+}
+
+
+def estimated_prompt_tokens(mode, trade) -> int:
+    trade_tokens = estimate_tokens(TRADE_PROMPT.format(trade_description=trade))
+    if mode == 'single_pass':
+        return estimate_tokens(SINGLE_PASS_PROMPT) + trade_tokens + schema_tokens(SwapWithScratchpad)
+    # stage 2 sees the stage 1 decomposition, which is usually several times longer than the trade itself
+    return estimate_tokens(CUSTOM_PROMPT) + trade_tokens + estimate_tokens(STRUCTURING_PROMPT) + schema_tokens(Swap)
+
+
+def run_mode(mode):
+    predict_fn = MODES[mode]
+    latencies, field_scores, prompt_tokens = [], {}, []
+    with get_usage_metadata_callback() as usage:
+        for trade in test_data:
+            start = time.perf_counter()
+            swap = predict_fn(trade['trade_description'])
+            latencies.append(time.perf_counter() - start)
+            prompt_tokens.append(estimated_prompt_tokens(mode, trade['trade_description']))
+            for field, value in score(parse_swap(swap.model_dump()), trade['ground_truth']).items():
+                field_scores.setdefault(field, []).append(value)
+    billed = {'input_tokens': 0, 'output_tokens': 0}
+    for model_usage in usage.usage_metadata.values():
+        for key in billed:
+            billed[key] += model_usage.get(key, 0)
+    return {
+        'field_accuracy': {field: sum(values) / len(values) for field, values in field_scores.items()},
+        'latency_mean': statistics.mean(latencies),
+        'latency_p50': statistics.median(latencies),
+        'estimated_prompt_tokens_per_trade': statistics.mean(prompt_tokens),
+        'billed_input_tokens_per_trade': billed['input_tokens'] / len(test_data),
+        'billed_output_tokens_per_trade': billed['output_tokens'] / len(test_data),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fake', action='store_true', help="use the local fake models instead of the live endpoint")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per fake model call")
+    parser.add_argument('--json', action='store_true', help="print the raw report as JSON")
+    args = parser.parse_args()
+
+    with fake_models(latency=args.latency) if args.fake else nullcontext():
+        report = {mode: run_mode(mode) for mode in MODES}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'field':<36}" + "".join(f"{mode:>12}" for mode in report))
+    for field in base.Swap.model_fields:
+        print(f"{field:<36}" + "".join(f"{r['field_accuracy'][field]:>12.2f}" for r in report.values()))
+    for metric in ('latency_mean', 'latency_p50', 'estimated_prompt_tokens_per_trade',
+                   'billed_input_tokens_per_trade', 'billed_output_tokens_per_trade'):
+        print(f"{metric:<36}" + "".join(f"{r[metric]:>12.2f}" for r in report.values()))
+    total = {mode: statistics.mean(r['field_accuracy'].values()) for mode, r in report.items()}
+    print(f"{'overall accuracy':<36}" + "".join(f"{value:>12.3f}" for value in total.values()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Offline bulk mode for provider batch endpoints (OpenAI Batch API request/result JSONL format).
+
+    1. render_description_requests: one `CUSTOM_PROMPT` chat request per input row, custom_id 'trade-<id>'
+    2. (provider runs the file)  ->  render_structuring_requests: one `STRUCTURING_PROMPT` request per
+       successful stage 1 result, asking for the JSON schema of `base.output_schema()`
+    3. (provider runs the file)  ->  ingest_structured_results: `Swap`s through `normalize_swaps` and
+       `swap_to_record` into the usual CSV or Parquet output
+
+Rows that fail at a stage (provider error, non-200 status, malformed JSON) go to a dead-letter JSONL next
+to the file being written. Stage 1 skips trade_ids already in the output, so a rerun only renders what is
+still missing. `fake_models.run_fake_batch` stands in for the provider when testing.
+"""
+import json
+from typing import Iterator, Optional
+
+import pandas as pd
+
+import base
+from base import CUSTOM_PROMPT, STRUCTURING_PROMPT, Swap, render_prompt, swap_to_record
+from normalize import normalize_swaps, to_records
+from streaming import DeadLetterWriter, dead_letter_path, open_output, scan_checkpoint
+
+ENDPOINT = "/v1/chat/completions"
+ROLES = {'system': 'system', 'human': 'user'}
+CUSTOM_ID_PREFIX = "trade-"
+# Same sampling as the `chat_description` / `chat_structured` models of the interactive path
+DESCRIPTION_TEMPERATURE = 0.5
+STRUCTURING_TEMPERATURE = 0
+
+
+def custom_id(trade_id) -> str:
+    return f"{CUSTOM_ID_PREFIX}{trade_id}"
+
+
+def trade_id_of(request_id: str) -> int:
+    return int(request_id[len(CUSTOM_ID_PREFIX):])
+
+
+def swap_response_format() -> dict:
+    # Strict structured outputs need every property listed as required and no additional properties
+    swap_schema = base.output_schema()
+    schema = swap_schema.model_json_schema()
+    schema['required'] = list(swap_schema.model_fields)
+    schema['additionalProperties'] = False
+    return {'type': 'json_schema', 'json_schema': {'name': swap_schema.__name__, 'schema': schema, 'strict': True}}
+
+
+def chat_request(trade_id, messages: list, temperature: float, model: Optional[str] = None, **body) -> dict:
+    """Request line for one call, with `messages` as (role, content) pairs from `base.render_prompt`."""
+    return {
+        'custom_id': custom_id(trade_id),
+        'method': 'POST',
+        'url': ENDPOINT,
+        'body': {
+            'model': model or base.model_name,
+            'temperature': temperature,
+            'messages': [{'role': ROLES[role], 'content': content} for role, content in messages],
+            **body,
+        },
+    }
+
+
+def completed_trade_ids(output_path: str, output_format: str = 'csv') -> set:
+    if output_format == 'parquet':
+        from columnar import completed_trade_ids as completed_parquet_ids
+        return completed_parquet_ids(output_path)
+    return scan_checkpoint(output_path)[0]
+
+
+def read_results(results_path: str) -> Iterator[tuple]:
+    """(trade_id, message content or None, error or None) for every line of a batch result file."""
+    with open(results_path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            trade_id = trade_id_of(result['custom_id'])
+            response = result.get('response') or {}
+            if result.get('error'):
+                yield trade_id, None, result['error']
+            elif response.get('status_code') != 200:
+                yield trade_id, None, {'status_code': response.get('status_code'), 'body': response.get('body')}
+            else:
+                yield trade_id, response['body']['choices'][0]['message']['content'], None
+
+
+def render_description_requests(input_path: str, requests_path: str, output_path: Optional[str] = None,
+                                output_format: str = 'csv', model: Optional[str] = None,
+                                chunksize: int = 10000) -> dict:
+    """Stage 1 requests for every row of `input_path` that `output_path` does not hold yet."""
+    done = completed_trade_ids(output_path, output_format) if output_path else set()
+    rendered = skipped = 0
+    with open(requests_path, 'w', encoding='utf-8') as f:
+        for chunk in pd.read_csv(input_path, chunksize=chunksize):
+            for trade_id, text in chunk['entry_text'].items():
+                if trade_id in done:
+                    skipped += 1
+                    continue
+                messages = render_prompt(CUSTOM_PROMPT, text)
+                f.write(json.dumps(chat_request(trade_id, messages, DESCRIPTION_TEMPERATURE, model)) + '\n')
+                rendered += 1
+    return {'rendered': rendered, 'skipped': skipped}
+
+
+def render_structuring_requests(results_path: str, requests_path: str, model: Optional[str] = None) -> dict:
+    """Stage 2 requests from the stage 1 results; failed stage 1 rows go to the requests file's dead letter."""
+    rendered = 0
+    dead_letters = DeadLetterWriter(dead_letter_path(requests_path))
+    try:
+        with open(requests_path, 'w', encoding='utf-8') as f:
+            for trade_id, content, error in read_results(results_path):
+                if error is not None:
+                    dead_letters.write({'trade_id': trade_id, 'stage': base.DESCRIPTION_STAGE, 'error': error})
+                    continue
+                messages = render_prompt(STRUCTURING_PROMPT, content)
+                request = chat_request(trade_id, messages, STRUCTURING_TEMPERATURE, model,
+                                       response_format=swap_response_format())
+                f.write(json.dumps(request) + '\n')
+                rendered += 1
+    finally:
+        dead_letters.close()
+    return {'rendered': rendered, 'failed': dead_letters.written}
+
+
+def ingest_structured_results(results_path: str, input_path: str, output_path: str, output_format: str = 'csv',
+                              chunksize: int = 10000, errors: Optional[list] = None) -> dict:
+    """
+    Append a record for every successful stage 2 result to `output_path`, in input order.
+    The parsed `Swap`s are held in memory until the input has been read; cell errors go to `errors`.
+    """
+    swaps = {}
+    dead_letters = DeadLetterWriter(dead_letter_path(output_path))
+    try:
+        for trade_id, content, error in read_results(results_path):
+            if error is None:
+                try:
+                    swaps[trade_id] = Swap.model_validate_json(content).model_dump()
+                    continue
+                except ValueError as exc:
+                    error = f"{type(exc).__name__}: {exc}"
+            dead_letters.write({'trade_id': trade_id, 'stage': base.STRUCTURING_STAGE, 'error': error})
+
+        writer, done = open_output(output_path, output_format)
+        with writer:
+            for chunk in pd.read_csv(input_path, chunksize=chunksize):
+                rows = [(trade_id, text) for trade_id, text in chunk['entry_text'].items()
+                        if trade_id in swaps and trade_id not in done]
+                if not rows:
+                    continue
+                normalized, cell_errors = normalize_swaps([swaps.pop(trade_id) for trade_id, _ in rows])
+                if errors is not None:
+                    errors.extend({'trade_id': rows[error.pop('row')][0], **error} for error in cell_errors)
+                for (trade_id, text), swap in zip(rows, to_records(normalized)):
+                    writer.write(swap_to_record(swap, trade_id, text))
+    finally:
+        dead_letters.close()
+    # Results whose trade_id is not in the input (or already written) are left over
+    return {'written': writer.written, 'failed': dead_letters.written, 'unmatched': len(swaps)}
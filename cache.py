@@ -0,0 +1,122 @@
+"""
+Content-addressed SQLite cache for the LLM stages of `predict()`.
+
+Entries are keyed by the rendered prompt, the model name, its temperature and, for the structured stage,
+a hash of the output schema. Stage 1 keys do not include the schema, so editing `STRUCTURING_PROMPT` or
+`Swap` only invalidates stage 2 and the cached decompositions are reused.
+"""
+import functools
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Optional
+
+from tracing import record_cache
+
+DEFAULT_CACHE_PATH = "llm_cache.sqlite"
+
+
+@functools.lru_cache(maxsize=None)
+def schema_hash(schema) -> str:
+    payload = json.dumps(schema.model_json_schema(), sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def describe_model(model) -> tuple:
+    """(model name, temperature) of a chat model, also looking through `with_structured_output` wrappers."""
+    first = getattr(model, 'first', None)
+    for candidate in (model, first, getattr(first, 'bound', None)):
+        name = getattr(candidate, 'model_name', None)
+        if name is not None:
+            return name, getattr(candidate, 'temperature', None)
+    return type(model).__name__, None
+
+
+def make_key(stage: str, prompt: str, model_name: str, temperature, schema=None) -> str:
+    payload = json.dumps([stage, prompt, model_name, temperature, schema_hash(schema) if schema is not None else None])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def format_stats(stats: dict) -> str:
+    parts = [f"{stage}: {c['hits']} hits / {c['misses']} misses" for stage, c in sorted(stats.items())]
+    return "; ".join(parts) or "no lookups"
+
+
+class ResponseCache:
+    """
+    Persistent cache of LLM responses.
+    `max_age_seconds` expires entries by creation time, `max_entries` evicts the least recently used ones.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None, evict_every: int = 100):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.evict_every = evict_every
+        self.stats = {}
+        self._puts = 0
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, stage TEXT NOT NULL, value TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.connection.commit()
+
+    def _key(self, stage, model, prompt, schema) -> str:
+        model_name, temperature = describe_model(model)
+        return make_key(stage, prompt, model_name, temperature, schema)
+
+    def _count(self, stage, outcome):
+        counters = self.stats.setdefault(stage, {'hits': 0, 'misses': 0})
+        counters[outcome] += 1
+        record_cache(stage, outcome == 'hits')
+
+    def lookup(self, stage: str, model, prompt: str, schema=None) -> Optional[str]:
+        key = self._key(stage, model, prompt, schema)
+        row = self.connection.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or (self.max_age_seconds is not None and now - row[1] > self.max_age_seconds):
+            self._count(stage, 'misses')
+            return None
+        self.connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self.connection.commit()
+        self._count(stage, 'hits')
+        return row[0]
+
+    def store(self, stage: str, model, prompt: str, value: str, schema=None):
+        key = self._key(stage, model, prompt, schema)
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses (key, stage, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, stage, value, now, now),
+        )
+        self.connection.commit()
+        self._puts += 1
+        if self._puts % self.evict_every == 0:
+            self.evict()
+
+    def evict(self):
+        if self.max_age_seconds is not None:
+            self.connection.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age_seconds,))
+        if self.max_entries is not None:
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        self.connection.commit()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def summary(self) -> str:
+        return format_stats(self.stats)
+
+    def close(self):
+        self.evict()
+        self.connection.close()
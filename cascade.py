@@ -0,0 +1,138 @@
+"""
+Two-tier model cascade: a cheaper model answers first in a single structured call, and only trades whose
+answer fails `validate_swap` are escalated to the full two-stage `predict()`.
+
+The validator is deterministic and only looks at the `Swap` itself:
+- every field parses (numbers with the units `normalize` accepts, dates as MM/DD/YYYY or YYYY-MM-DD),
+- at least one leg carries a fixed rate, an index or a spread,
+- no leg is both fixed and floating,
+- legs in the same currency are not both fixed and have the same notional,
+- the tenor agrees with the effective and maturity dates, and maturity comes after the effective date,
+- currency codes are ISO 4217.
+"""
+import datetime
+import time
+from typing import NamedTuple, Optional
+
+from base import Swap, apredict, apredict_single_pass, predict, predict_single_pass
+from normalize import parse_number
+
+CHEAP_TIER = "cheap"
+FULL_TIER = "full"
+CHEAP_MODEL = 'cheap_model'
+
+# Active ISO 4217 codes, plus CNH which is not ISO but is how offshore renminbi swaps are quoted
+ISO_CURRENCIES = frozenset("""
+    AED AFN ALL AMD ANG AOA ARS AUD AWG AZN BAM BBD BDT BGN BHD BIF BMD BND BOB BRL BSD BTN BWP BYN BZD CAD CDF
+    CHF CLP CNY COP CRC CUP CVE CZK DJF DKK DOP DZD EGP ERN ETB EUR FJD FKP GBP GEL GHS GIP GMD GNF GTQ GYD HKD
+    HNL HTG HUF IDR ILS INR IQD IRR ISK JMD JOD JPY KES KGS KHR KMF KPW KRW KWD KYD KZT LAK LBP LKR LRD LSL LYD
+    MAD MDL MGA MKD MMK MNT MOP MRU MUR MVR MWK MXN MYR MZN NAD NGN NIO NOK NPR NZD OMR PAB PEN PGK PHP PKR PLN
+    PYG QAR RON RSD RUB RWF SAR SBD SCR SDG SEK SGD SHP SLE SOS SRD SSP STN SVC SYP SZL THB TJS TMT TND TOP TRY
+    TTD TWD TZS UAH UGX USD UYU UZS VES VND VUV WST XAF XCD XOF XPF YER ZAR ZMW ZWL CNH
+""".split())
+DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d']
+# Roll conventions move the maturity by a few days; anything further off than a month is a wrong field
+TENOR_TOLERANCE_YEARS = 1 / 12
+LEGS = ('PayLeg', 'RecLeg')
+
+
+class CascadeResult(NamedTuple):
+    swap: Swap
+    tier: str
+    problems: list
+    seconds: dict
+
+
+def parse_date(value) -> Optional[datetime.date]:
+    if value is None or str(value).strip() == '':
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(str(value).strip(), date_format).date()
+        except ValueError:
+            continue
+    raise ValueError("could not parse date")
+
+
+def validate_swap(swap: Swap) -> list:
+    """Reasons `swap` cannot be trusted as is; empty when it passes every check."""
+    fields = swap.model_dump()
+    problems = []
+    numbers, dates = {}, {}
+    for field, value in fields.items():
+        try:
+            if field in ('EffectiveDate', 'MaturityDate'):
+                dates[field] = parse_date(value)
+            elif field.endswith(('Ccy', 'Basis', 'FloatIndex')):
+                continue
+            else:
+                numbers[field] = parse_number(value, field)
+        except ValueError:
+            problems.append(f"{field} does not parse: {value!r}")
+    if problems:
+        return problems
+
+    fixed = {leg: numbers[f'{leg}FixedRatePct'] is not None for leg in LEGS}
+    floating = {leg: fields[f'{leg}FloatIndex'] is not None or numbers[f'{leg}FloatSpreadBp'] is not None
+                for leg in LEGS}
+    if not any(fixed.values()) and not any(floating.values()):
+        problems.append("no fixed rate, index or spread on either leg")
+    for leg in LEGS:
+        if fixed[leg] and floating[leg]:
+            problems.append(f"{leg} is both fixed and floating")
+
+    currencies = {leg: fields[f'{leg}Ccy'] and fields[f'{leg}Ccy'].strip().upper() for leg in LEGS}
+    for leg, currency in currencies.items():
+        if currency and currency not in ISO_CURRENCIES:
+            problems.append(f"{leg}Ccy is not an ISO currency code: {fields[f'{leg}Ccy']!r}")
+    pay_currency, rec_currency = currencies['PayLeg'], currencies['RecLeg']
+    single_currency = not pay_currency or not rec_currency or pay_currency == rec_currency
+    if pay_currency and pay_currency == rec_currency and all(fixed.values()):
+        problems.append("both legs fixed in the same currency")
+    notionals = [numbers[f'{leg}Notional'] for leg in LEGS]
+    if single_currency and None not in notionals and notionals[0] != notionals[1]:
+        problems.append("notionals differ in a single-currency swap")
+
+    effective, maturity, tenor = dates['EffectiveDate'], dates['MaturityDate'], numbers['TenorYears']
+    if effective is not None and maturity is not None:
+        if maturity <= effective:
+            problems.append("maturity is not after the effective date")
+        elif tenor is not None and abs((maturity - effective).days / 365.25 - tenor) > TENOR_TOLERANCE_YEARS:
+            problems.append(f"tenor {tenor:g}y disagrees with the dates")
+    if tenor is not None and tenor <= 0:
+        problems.append("tenor is not positive")
+    return problems
+
+
+def run_cascade(trade, cache=None, fallback=predict) -> CascadeResult:
+    start = time.perf_counter()
+    swap = predict_single_pass(trade, cache=cache, model=CHEAP_MODEL)
+    seconds = {CHEAP_TIER: time.perf_counter() - start}
+    problems = validate_swap(swap)
+    if not problems:
+        return CascadeResult(swap, CHEAP_TIER, problems, seconds)
+    start = time.perf_counter()
+    swap = fallback(trade, cache=cache)
+    seconds[FULL_TIER] = time.perf_counter() - start
+    return CascadeResult(swap, FULL_TIER, problems, seconds)
+
+
+async def arun_cascade(trade, cache=None, fallback=apredict) -> CascadeResult:
+    start = time.perf_counter()
+    swap = await apredict_single_pass(trade, cache=cache, model=CHEAP_MODEL)
+    seconds = {CHEAP_TIER: time.perf_counter() - start}
+    problems = validate_swap(swap)
+    if not problems:
+        return CascadeResult(swap, CHEAP_TIER, problems, seconds)
+    start = time.perf_counter()
+    swap = await fallback(trade, cache=cache)
+    seconds[FULL_TIER] = time.perf_counter() - start
+    return CascadeResult(swap, FULL_TIER, problems, seconds)
+
+
+def predict_cascade(trade, cache=None, fallback=predict) -> Swap:
+    return run_cascade(trade, cache=cache, fallback=fallback).swap
+
+
+async def apredict_cascade(trade, cache=None, fallback=apredict) -> Swap:
+    return (await arun_cascade(trade, cache=cache, fallback=fallback)).swap
@@ -0,0 +1,226 @@
+"""
+Command line entry point for batch runs.
+
+    python cli.py run --input HackathonOutput.csv --output HackathonPredictions.csv --concurrency 16
+    python cli.py run --input HackathonOutput.csv --output HackathonPredictions.csv --concurrency 64 --shards 4
+
+Offline bulk mode through a provider batch endpoint, uploading each requests file and downloading its results:
+
+    python cli.py batch-describe --input HackathonOutput.csv --requests describe.jsonl --output HackathonPredictions.csv
+    python cli.py batch-structure --results describe_results.jsonl --requests structure.jsonl
+    python cli.py batch-ingest --results structure_results.jsonl --input HackathonOutput.csv --output HackathonPredictions.csv
+
+Importing `base` has no side effects; batch runs only start from here.
+"""
+import argparse
+import functools
+import json
+
+DEFAULT_INPUT = "./HackathonOutput.csv"
+DEFAULT_OUTPUT = "./HackathonPredictions.csv"
+MODES = ('two_pass', 'single_pass', 'cascade')
+
+
+def report_cell_errors(output_path: str, cell_errors: list):
+    if not cell_errors:
+        return
+    errors_path = f"{output_path.rstrip('/')}.cell_errors.jsonl"
+    with open(errors_path, 'a') as f:
+        for error in cell_errors:
+            f.write(json.dumps(error, default=str) + '\n')
+    print(f"{len(cell_errors)} fields could not be parsed and were left empty, see {errors_path}")
+
+
+def execute(args) -> dict:
+    """
+    One streaming run as described by the `run` arguments, also the body of every worker of a sharded run.
+    Returns the `run_streaming` stats plus the retry summary, cache counts and trace records, all picklable.
+    """
+    import base
+    from cache import ResponseCache
+    from engine import PREDICT_MODES, RateLimiter
+    from fast_path import apredict_fast
+    from retry import CircuitBreaker, Retrier
+    from streaming import dead_letter_path, run_streaming
+    from tracing import Tracer
+
+    # `retrier` below retries whole rows, so the client retrying each call on top would multiply the attempts
+    base.configure(model=args.model, api_key=args.api_key, cheap_model=args.cheap_model, compact=args.compact_schema,
+                   client_retries=0)
+    predict_fn = PREDICT_MODES[args.mode]
+    if args.fast_path:
+        predict_fn = functools.partial(apredict_fast, fallback=predict_fn)
+    cache = ResponseCache(args.cache) if args.cache else None
+    rate_limiter = RateLimiter(requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    tracer = Tracer(f"{args.output.rstrip('/')}.trace.jsonl") if args.trace else None
+    retrier = Retrier(max_attempts=args.max_attempts, timeout=args.timeout, breaker=CircuitBreaker())
+
+    try:
+        stats = run_streaming(
+            args.input, args.output, output_format=args.format, chunksize=args.chunksize,
+            concurrency=args.concurrency, rate_limiter=rate_limiter, predict_fn=predict_fn, cache=cache,
+            dedupe=args.dedupe, tracer=tracer, retrier=retrier, dead_letter_path=dead_letter_path(args.output),
+            trade_ids=getattr(args, 'trade_ids', None), progress=getattr(args, 'progress', True),
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+        if tracer is not None:
+            tracer.close()
+    return {
+        **stats,
+        'retries': retrier.summary(),
+        'cache': cache.stats if cache is not None else None,
+        'traces': tracer.trades if tracer is not None else None,
+    }
+
+
+def run(args):
+    from cache import format_stats
+    from streaming import dead_letter_path
+    from tracing import format_summary, summarize
+
+    if args.shards > 1:
+        from sharding import run_sharded
+        stats = run_sharded(args)
+        failures = f"the shards' dead-letter files under {stats['shard_dir']}"
+    else:
+        stats = execute(args)
+        failures = dead_letter_path(args.output)
+    print(f"Wrote {stats['written']} rows, skipped {stats['skipped']} already done.")
+    retries = stats['retries']
+    print(f"Retries: {retries['retries']} over {retries['attempts']} attempts, "
+          f"circuit breaker opened {retries['breaker_opens']} times")
+    if stats['failed']:
+        print(f"{stats['failed']} rows failed and were written to {failures}; rerun to retry them")
+    rows = sum(batch['rows'] for batch in stats['dedup'])
+    if rows:
+        saved = sum(batch['predict_calls_saved'] for batch in stats['dedup'])
+        print(f"Dedup: {saved} of {rows} rows served by a duplicate description ({saved / rows:.1%}), "
+              f"{saved} predict() calls saved")
+    report_cell_errors(args.output, stats['cell_errors'])
+    if stats['cache'] is not None:
+        print(f"Cache: {format_stats(stats['cache'])}")
+    if stats['traces'] is not None:
+        print(format_summary(summarize(stats['traces'])))
+
+
+def batch_describe(args):
+    from bulk import render_description_requests
+
+    stats = render_description_requests(args.input, args.requests, output_path=args.output,
+                                        output_format=args.format, model=args.model)
+    print(f"Wrote {stats['rendered']} description requests to {args.requests}, "
+          f"skipped {stats['skipped']} rows already in {args.output}.")
+
+
+def batch_structure(args):
+    import base
+    from bulk import render_structuring_requests
+    from streaming import dead_letter_path
+
+    base.configure(compact=args.compact_schema)
+    stats = render_structuring_requests(args.results, args.requests, model=args.model)
+    print(f"Wrote {stats['rendered']} structuring requests to {args.requests}.")
+    if stats['failed']:
+        print(f"{stats['failed']} description requests failed, see {dead_letter_path(args.requests)}; "
+              f"they are rendered again by the next batch-describe")
+
+
+def batch_ingest(args):
+    from bulk import ingest_structured_results
+    from streaming import dead_letter_path
+
+    cell_errors = []
+    stats = ingest_structured_results(args.results, args.input, args.output, output_format=args.format,
+                                      errors=cell_errors)
+    print(f"Wrote {stats['written']} rows to {args.output}.")
+    if stats['failed']:
+        print(f"{stats['failed']} structuring requests failed, see {dead_letter_path(args.output)}; "
+              f"they are rendered again by the next batch-describe")
+    if stats['unmatched']:
+        print(f"{stats['unmatched']} results matched no pending input row and were ignored")
+    report_cell_errors(args.output, cell_errors)
+
+
+def batch_fake(args):
+    from fake_models import run_fake_batch
+
+    stats = run_fake_batch(args.requests, args.results, error_rate=args.error_rate)
+    print(f"Answered {stats['requests']} requests into {args.results}, {stats['errors']} of them with errors.")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Swap trade extraction batch runs")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="predict every row of an input CSV into an output CSV")
+    run_parser.add_argument('--input', default=DEFAULT_INPUT)
+    run_parser.add_argument('--output', default=DEFAULT_OUTPUT, help="appended to and resumed from if it exists")
+    run_parser.add_argument('--format', choices=('csv', 'parquet'), default='csv',
+                            help="parquet writes a directory of typed part files")
+    run_parser.add_argument('--model', default=None, help="chat model name (default: base.model_name)")
+    run_parser.add_argument('--cheap-model', default=None,
+                            help="first-tier model of --mode cascade (default: base.cheap_model_name)")
+    run_parser.add_argument('--api-key', default=None, help="OpenAI key (default: $OPENAI_API_KEY)")
+    run_parser.add_argument('--mode', choices=MODES, default='two_pass')
+    run_parser.add_argument('--compact-schema', action='store_true',
+                            help="ask the structured models for base.CompactSwap, with trimmed field descriptions")
+    run_parser.add_argument('--no-fast-path', dest='fast_path', action='store_false',
+                            help="send every row to the LLM, even simple ones")
+    run_parser.add_argument('--no-dedupe', dest='dedupe', action='store_false',
+                            help="predict every row, even when its description repeats another one")
+    run_parser.add_argument('--concurrency', type=int, default=16, help="trades in flight, over all shards")
+    run_parser.add_argument('--rpm', type=float, default=500, help="requests per minute limit, over all shards")
+    run_parser.add_argument('--tpm', type=float, default=30000, help="tokens per minute limit, over all shards")
+    run_parser.add_argument('--shards', type=int, default=1,
+                            help="worker processes, each predicting a trade_id range into <output>.shards/, "
+                                 "merged into --output at the end")
+    run_parser.add_argument('--chunksize', type=int, default=1000)
+    run_parser.add_argument('--cache', default='llm_cache.sqlite', help="SQLite response cache, '' to disable")
+    run_parser.add_argument('--max-attempts', type=int, default=5, help="attempts per row on transient errors")
+    run_parser.add_argument('--timeout', type=float, default=120, help="seconds allowed per model call")
+    run_parser.add_argument('--trace', action='store_true',
+                            help="append per-trade stage timings and token counts to <output>.trace.jsonl")
+    run_parser.set_defaults(func=run)
+
+    describe_parser = commands.add_parser('batch-describe',
+                                          help="render the description batch requests for the rows still to do")
+    describe_parser.add_argument('--input', default=DEFAULT_INPUT)
+    describe_parser.add_argument('--requests', required=True, help="batch request JSONL to write")
+    describe_parser.add_argument('--output', default=DEFAULT_OUTPUT, help="rows already in it are skipped")
+    describe_parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    describe_parser.add_argument('--model', default=None, help="chat model name (default: base.model_name)")
+    describe_parser.set_defaults(func=batch_describe)
+
+    structure_parser = commands.add_parser('batch-structure',
+                                           help="render the structuring batch requests from description results")
+    structure_parser.add_argument('--results', required=True, help="batch result JSONL of batch-describe's requests")
+    structure_parser.add_argument('--requests', required=True, help="batch request JSONL to write")
+    structure_parser.add_argument('--model', default=None, help="chat model name (default: base.model_name)")
+    structure_parser.add_argument('--compact-schema', action='store_true',
+                                  help="ask for base.CompactSwap, with trimmed field descriptions")
+    structure_parser.set_defaults(func=batch_structure)
+
+    ingest_parser = commands.add_parser('batch-ingest', help="append structuring results to the output")
+    ingest_parser.add_argument('--results', required=True, help="batch result JSONL of batch-structure's requests")
+    ingest_parser.add_argument('--input', default=DEFAULT_INPUT)
+    ingest_parser.add_argument('--output', default=DEFAULT_OUTPUT, help="appended to if it exists")
+    ingest_parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    ingest_parser.set_defaults(func=batch_ingest)
+
+    fake_parser = commands.add_parser('batch-fake', help="answer a batch request JSONL offline with the fake models")
+    fake_parser.add_argument('--requests', required=True)
+    fake_parser.add_argument('--results', required=True)
+    fake_parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with a 500")
+    fake_parser.set_defaults(func=batch_fake)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
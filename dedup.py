@@ -0,0 +1,30 @@
+"""
+Canonical form of trade descriptions, so rows that only differ in whitespace, line breaks, casing or
+currency symbols ("$50 million" vs "USD 50 million") share one prediction.
+
+Rows share a prediction within the sliding window of `engine.apredict_rows`; repeats further apart are
+served by the response cache when it is enabled.
+"""
+import re
+import unicodedata
+
+from fast_path import CURRENCY_SYMBOLS
+
+WHITESPACE = re.compile(r'\s+')
+SYMBOL_REGEX = re.compile('|'.join(re.escape(symbol) for symbol in CURRENCY_SYMBOLS))
+
+
+def canonicalize(text) -> str:
+    text = unicodedata.normalize('NFKC', str(text))
+    text = SYMBOL_REGEX.sub(lambda match: f' {CURRENCY_SYMBOLS[match.group()]} ', text)
+    return WHITESPACE.sub(' ', text).strip().casefold()
+
+
+def batch_stats(rows: int, groups: int) -> dict:
+    """`dedup_ratio` is the share of rows answered by another row's prediction."""
+    return {
+        'rows': rows,
+        'unique': groups,
+        'dedup_ratio': 1 - groups / rows if rows else 0.0,
+        'predict_calls_saved': rows - groups,
+    }
@@ -0,0 +1,303 @@
+import asyncio
+import functools
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, Optional, Sized
+
+from tqdm import tqdm
+
+from base import DESCRIPTION_STAGE, SINGLE_PASS_STAGE, STRUCTURING_STAGE, output_schema
+from base import Swap, apredict, apredict_single_pass, swap_to_record
+from cache import ResponseCache
+from cascade import apredict_cascade
+from dedup import batch_stats, canonicalize
+from normalize import normalize_swaps, to_records
+from retry import Retrier
+from tracing import Tracer, current_rate_limiter, current_timeout, current_trace
+
+# Rough upper bound on what a single call of each stage costs in completion tokens,
+# used only to budget the tokens-per-minute limit before the call is made.
+COMPLETION_TOKENS_ESTIMATE = {
+    DESCRIPTION_STAGE: 600,
+    STRUCTURING_STAGE: 300,
+    SINGLE_PASS_STAGE: 600,
+}
+
+# Selectable prediction pipelines: the two-call decomposition + structuring, one structured call, or a cheap
+# single call that escalates to the two-call pipeline when its answer fails validation
+PREDICT_MODES = {
+    'two_pass': apredict,
+    'single_pass': apredict_single_pass,
+    'cascade': apredict_cascade,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text with the OpenAI tokenizers
+    return len(text) // 4 + 1
+
+
+def estimate_prompt_tokens(prompt) -> int:
+    """Tokens of a plain prompt or of the chat messages from `base.render_prompt`."""
+    if isinstance(prompt, str):
+        return estimate_tokens(prompt)
+    return sum(estimate_tokens(content) for _, content in prompt)
+
+
+@functools.lru_cache(maxsize=None)
+def schema_tokens(schema) -> int:
+    return estimate_tokens(json.dumps(schema.model_json_schema()))
+
+
+def estimate_call_tokens(prompt, stage: str) -> int:
+    """Prompt and completion tokens of one call of `stage`, including the schema sent with structured calls."""
+    tokens = estimate_prompt_tokens(prompt) + COMPLETION_TOKENS_ESTIMATE[stage]
+    if stage != DESCRIPTION_STAGE:
+        tokens += schema_tokens(output_schema(scratchpad=stage == SINGLE_PASS_STAGE))
+    return tokens
+
+
+class TokenBucket:
+    """Bucket refilled continuously at `rate_per_minute`, holding at most `capacity` units."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Requests bigger than the bucket would never fit, so they only wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Token-bucket limiter enforcing both requests-per-minute and tokens-per-minute."""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.buckets = {}
+        if requests_per_minute:
+            self.buckets['requests'] = TokenBucket(requests_per_minute)
+        if tokens_per_minute:
+            self.buckets['tokens'] = TokenBucket(tokens_per_minute)
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, requests: int = 1, tokens: int = 0):
+        amounts = {'requests': requests, 'tokens': tokens}
+        async with self._lock:
+            while True:
+                for bucket in self.buckets.values():
+                    bucket.refill()
+                delay = max((bucket.wait_time(amounts[name]) for name, bucket in self.buckets.items()), default=0.0)
+                if delay <= 0:
+                    for name, bucket in self.buckets.items():
+                        bucket.consume(amounts[name])
+                    return
+                await asyncio.sleep(delay)
+
+    async def acquire_call(self, prompt, stage: str):
+        """Budget of one model call: a request plus its `estimate_call_tokens`."""
+        await self.acquire(1, estimate_call_tokens(prompt, stage))
+
+
+async def apredict_rows(
+    rows: Iterable[tuple],
+    concurrency: int = 8,
+    rate_limiter: Optional[RateLimiter] = None,
+    predict_fn: Callable[..., Awaitable[Swap]] = apredict,
+    cache: Optional[ResponseCache] = None,
+    on_record: Optional[Callable[[dict], None]] = None,
+    errors: Optional[list] = None,
+    postprocess_batch: int = 256,
+    dedupe: bool = True,
+    dedup_stats: Optional[list] = None,
+    tracer: Optional[Tracer] = None,
+    retrier: Optional[Retrier] = None,
+    on_failure: Optional[Callable[[dict], None]] = None,
+    window: Optional[int] = None,
+    progress: bool = True,
+) -> list:
+    """
+    Predict every (trade_id, trade_description) pair concurrently.
+    At most `concurrency` trades are in flight at once; the returned records are ordered by trade_id.
+    `cache` is forwarded to `predict_fn` so repeated inputs skip the LLM calls they already paid for.
+    With `on_record`, records are handed over in trade_id order once they and every earlier trade_id are done,
+    and nothing is accumulated: the call then returns an empty list.
+
+    `rows` may be a lazy iterator, e.g. over the chunks of a file, as long as it yields them in trade_id
+    order; anything with a length is sorted first. With `window`, rows are pulled from it as a sliding window:
+    a row is only started once fewer than `window` rows are waiting to be handed over, so a slow row holds up
+    the rows behind it only once the window has filled.
+
+    Raw swaps are post-processed by `normalize_swaps` in batches of up to `postprocess_batch` rows. Cells that
+    fail to parse are left empty and, if `errors` is given, appended to it with their trade_id.
+
+    With `dedupe`, rows whose descriptions are equal after `dedup.canonicalize` share one prediction: a row
+    joins a prediction still in flight, or reuses one of the last `window` finished ones. The call's
+    `dedup.batch_stats` are appended to `dedup_stats` if given.
+
+    With a `rate_limiter`, every model call waits for its share of the budget just before it goes out (see
+    `tracing.ainvoke`), so rows answered from the cache or without the model do not wait at all.
+
+    With a `tracer`, every prediction is traced (see `tracing`) from the moment it starts waiting for a slot.
+
+    With a `retrier`, a prediction that hits a transient error is retried (see `retry`), queueing for a slot
+    again each time, so rows in backoff do not hold up the rest. Its timeout applies to each model call. With
+    `on_failure`, a row that still fails is handed over as {'trade_id', 'entry_text', 'error_type', 'error',
+    'attempts'} and left out of the records; without it the error propagates and aborts the batch.
+    """
+    if isinstance(rows, Sized):
+        rows = sorted(rows, key=lambda row: row[0])
+    records = []
+    emit = on_record if on_record is not None else records.append
+    semaphore = asyncio.Semaphore(concurrency)
+    bar = tqdm(total=len(rows) if isinstance(rows, Sized) else None, disable=not progress)
+    admitted_rows = {}
+    finished = {}
+    pending = []
+    next_position = 0
+    # Canonical description -> positions waiting on its prediction, and -> swap of a finished prediction
+    in_flight = {}
+    answered = OrderedDict()
+    tasks = set()
+    released = asyncio.Event()
+    fatal = None
+
+    def flush():
+        predicted = [row for row in pending if row[2] is not None]
+        pending.clear()
+        if not predicted:
+            return
+        normalized, cell_errors = normalize_swaps([swap for _, _, swap in predicted])
+        if errors is not None:
+            for error in cell_errors:
+                errors.append({'trade_id': predicted[error.pop('row')][0], **error})
+        for (trade_id, trade_description, _), swap in zip(predicted, to_records(normalized)):
+            emit(swap_to_record(swap, trade_id, trade_description))
+
+    def release(position, swap):
+        nonlocal next_position
+        finished[position] = (*admitted_rows[position], swap)
+        bar.update(1)
+        while next_position in finished:
+            pending.append(finished.pop(next_position))
+            del admitted_rows[next_position]
+            next_position += 1
+        if len(pending) >= postprocess_batch:
+            flush()
+        released.set()
+
+    async def attempt(trade_description, trace):
+        queued = time.perf_counter()
+        async with semaphore:
+            if retrier is not None:
+                await retrier.breaker.wait()
+            if trace is not None:
+                trace.wait_seconds += time.perf_counter() - queued
+            return await predict_fn(trade_description, cache=cache)
+
+    async def run(key, trade_description):
+        positions = in_flight[key]
+        trace = tracer.start(admitted_rows[position][0] for position in positions) if tracer is not None else None
+        # Each run is its own task, so the trace, limiter and timeout are only current for this prediction
+        current_trace.set(trace)
+        current_rate_limiter.set(rate_limiter)
+        current_timeout.set(retrier.timeout if retrier is not None else None)
+        attempts = 1
+
+        def on_retry(attempt_number, exc, delay):
+            nonlocal attempts
+            attempts += 1
+            if trace is not None:
+                trace.retries += 1
+
+        try:
+            if retrier is None:
+                swap = await attempt(trade_description, trace)
+            else:
+                swap = await retrier.run(lambda: attempt(trade_description, trace), on_retry=on_retry)
+        except Exception as exc:
+            if on_failure is None:
+                raise
+            swap = None
+            if trace is not None:
+                trace.error = f"{type(exc).__name__}: {exc}"
+            for position in positions:
+                trade_id, text = admitted_rows[position]
+                on_failure({'trade_id': trade_id, 'entry_text': text, 'error_type': type(exc).__name__,
+                            'error': str(exc), 'attempts': attempts})
+        finally:
+            # Rows that joined while the prediction was running are part of it too
+            del in_flight[key]
+            if trace is not None:
+                trace.trade_ids = [admitted_rows[position][0] for position in positions]
+                tracer.finish(trace)
+        if swap is not None and dedupe:
+            answered[key] = swap
+            if window is not None and len(answered) > window:
+                answered.popitem(last=False)
+        for position in positions:
+            release(position, swap)
+
+    def done(task):
+        nonlocal fatal
+        tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None and fatal is None:
+            fatal = task.exception()
+            released.set()
+
+    admitted = predictions = 0
+    try:
+        for row in rows:
+            while window is not None and admitted - next_position >= window and fatal is None:
+                released.clear()
+                await released.wait()
+            if fatal is not None:
+                break
+            position = admitted
+            admitted += 1
+            admitted_rows[position] = row
+            key = canonicalize(row[1]) if dedupe else position
+            if key in in_flight:
+                in_flight[key].append(position)
+            elif key in answered:
+                answered.move_to_end(key)
+                release(position, answered[key])
+            else:
+                predictions += 1
+                in_flight[key] = [position]
+                task = asyncio.create_task(run(key, row[1]))
+                tasks.add(task)
+                task.add_done_callback(done)
+                # Let the prediction start before reading on, so a lazy `rows` is not drained up front
+                await asyncio.sleep(0)
+        while tasks and fatal is None:
+            await asyncio.wait(set(tasks), return_when=asyncio.FIRST_COMPLETED)
+        if fatal is not None:
+            raise fatal
+        if pending:
+            flush()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        bar.close()
+    if dedup_stats is not None:
+        dedup_stats.append(batch_stats(admitted, predictions))
+    return records
+
+
+def predict_rows(rows: Iterable[tuple], **kwargs) -> list:
+    return asyncio.run(apredict_rows(rows, **kwargs))
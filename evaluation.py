@@ -0,0 +1,158 @@
+"""
+Vectorized evaluation of predicted swaps against ground truth.
+
+Predictions and ground truth are loaded as column-typed frames indexed by trade_id and compared column-wise:
+numeric fields numerically ('100000000' == 100000000, a zero spread == no spread), string fields case- and
+whitespace-insensitively ('Act/360' == 'ACT/360'), dates as calendar dates. Both `Swap` field names and the
+`swap_to_record` output columns are accepted.
+
+    python evaluation.py predictions.csv ground_truth.csv --out report.json
+"""
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from base import Swap, swap_to_record, test_data
+
+FIELDS = list(Swap.model_fields)
+RECORD_COLUMNS = {column: field for column, field in swap_to_record({f: f for f in FIELDS}, None, None).items()
+                  if field in FIELDS}
+DATE_FIELDS = ['EffectiveDate', 'MaturityDate']
+NUMERIC_FIELDS = ['TenorYears', 'PayLegNotional', 'PayLegFreqMonths', 'PayLegFloatSpreadBp', 'PayLegFixedRatePct',
+                  'RecLegNotional', 'RecLegFreqMonths', 'RecLegFloatSpreadBp', 'RecLegFixedRatePct']
+SPREAD_FIELDS = ['PayLegFloatSpreadBp', 'RecLegFloatSpreadBp']
+STRING_FIELDS = [field for field in FIELDS if field not in DATE_FIELDS and field not in NUMERIC_FIELDS]
+
+
+def to_frame(data, key: str = 'trade_id') -> pd.DataFrame:
+    """Frame of `Swap` fields indexed by `key` from a DataFrame or a list of dicts (records or swaps)."""
+    frame = data.copy() if isinstance(data, pd.DataFrame) else pd.DataFrame(list(data))
+    frame = frame.rename(columns=RECORD_COLUMNS)
+    if key in frame.columns:
+        frame = frame.set_index(key)
+    return frame.reindex(columns=FIELDS)
+
+
+def normalize(frame: pd.DataFrame) -> tuple:
+    """
+    Typed copy of `frame` and a mask of cells that were filled but could not be parsed.
+    Unparseable cells become NA in the typed frame and must never count as matching a missing value.
+    """
+    typed = pd.DataFrame(index=frame.index)
+    invalid = pd.DataFrame(index=frame.index)
+    typed_fields = NUMERIC_FIELDS + DATE_FIELDS
+    present = (frame[typed_fields].astype('string').apply(lambda column: column.str.strip()) != '').fillna(False)
+    for field in NUMERIC_FIELDS:
+        values = pd.to_numeric(frame[field], errors='coerce').astype('float64')
+        invalid[field] = present[field] & values.isna()
+        if field in SPREAD_FIELDS:
+            values = values.mask(values == 0)
+        typed[field] = values
+    for field in DATE_FIELDS:
+        typed[field] = pd.to_datetime(frame[field], errors='coerce', format='mixed').dt.normalize()
+        invalid[field] = present[field] & typed[field].isna()
+    for field in STRING_FIELDS:
+        values = frame[field].astype('string').str.strip().str.replace(r'\s+', ' ', regex=True).str.casefold()
+        typed[field] = values.mask(values == '')
+        invalid[field] = False
+    return typed[FIELDS], invalid[FIELDS]
+
+
+def compare(predictions: pd.DataFrame, ground_truth: pd.DataFrame, normalized_truth: tuple = None) -> pd.DataFrame:
+    """Boolean frame (ground truth index x fields) of per-cell matches. Missing predictions never match."""
+    predicted, predicted_invalid = normalize(predictions.reindex(ground_truth.index))
+    truth, truth_invalid = normalized_truth if normalized_truth is not None else normalize(ground_truth)
+    matches = pd.DataFrame(index=truth.index)
+    for field in FIELDS:
+        p, t = predicted[field], truth[field]
+        if field in NUMERIC_FIELDS:
+            equal = pd.Series(np.isclose(p.to_numpy(), t.to_numpy(), rtol=1e-9, atol=1e-9), index=t.index)
+        else:
+            equal = (p == t).fillna(False).astype(bool)
+        both_missing = p.isna() & t.isna() & ~predicted_invalid[field] & ~truth_invalid[field]
+        matches[field] = equal | both_missing
+    missing = ~ground_truth.index.isin(predictions.index)
+    matches.loc[missing, :] = False
+    return matches
+
+
+def instrument_types(truth: pd.DataFrame) -> pd.Series:
+    """Instrument type of each trade in a normalized ground truth frame, from which legs are fixed or floating."""
+    pay_fixed, rec_fixed = truth['PayLegFixedRatePct'].notna(), truth['RecLegFixedRatePct'].notna()
+    pay_float = truth['PayLegFloatIndex'].notna() | truth['PayLegFloatSpreadBp'].notna()
+    rec_float = truth['RecLegFloatIndex'].notna() | truth['RecLegFloatSpreadBp'].notna()
+    cross_currency = (truth['PayLegCcy'].notna() & truth['RecLegCcy'].notna()
+                      & (truth['PayLegCcy'] != truth['RecLegCcy']).fillna(False))
+    conditions = [
+        cross_currency.to_numpy(dtype=bool),
+        ((pay_fixed & rec_float) | (pay_float & rec_fixed)).to_numpy(),
+        (pay_float & rec_float).to_numpy(),
+        (pay_fixed & rec_fixed).to_numpy(),
+    ]
+    choices = ['cross_currency', 'fixed_float', 'basis', 'fixed_fixed']
+    return pd.Series(np.select(conditions, choices, default='unknown'), index=truth.index, name='instrument_type')
+
+
+def summarize(matches: pd.DataFrame) -> dict:
+    exact = matches.all(axis=1)
+    return {
+        'rows': int(len(matches)),
+        'overall_accuracy': float(matches.to_numpy().mean()) if len(matches) else 0.0,
+        'exact_match_rate': float(exact.mean()) if len(matches) else 0.0,
+        'field_accuracy': {field: float(value) for field, value in matches.mean().items()},
+    }
+
+
+def evaluate(predictions, ground_truth, key: str = 'trade_id') -> dict:
+    """Machine-readable accuracy report: overall, per field, per trade exact match and per instrument type."""
+    predictions, ground_truth = to_frame(predictions, key), to_frame(ground_truth, key)
+    normalized_truth = normalize(ground_truth)
+    matches = compare(predictions, ground_truth, normalized_truth)
+    types = instrument_types(normalized_truth[0])
+    report = summarize(matches)
+    report['missing_predictions'] = int((~ground_truth.index.isin(predictions.index)).sum())
+    report['by_instrument_type'] = {kind: summarize(group) for kind, group in matches.groupby(types)}
+    report['mismatched_trades'] = mismatched_fields(matches)
+    return report
+
+
+def mismatched_fields(matches: pd.DataFrame) -> dict:
+    """{trade_id: [fields that do not match]} for every trade with at least one mismatch."""
+    # Row-major, so the (row, column) pairs come grouped by row with the columns in field order
+    rows, columns = np.nonzero(~matches.to_numpy(dtype=bool))
+    if not len(rows):
+        return {}
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    fields = np.asarray(matches.columns, dtype=object)[columns]
+    trade_ids = matches.index.to_numpy()[rows[starts]]
+    return {str(trade_id): group.tolist() for trade_id, group in zip(trade_ids, np.split(fields, starts[1:]))}
+
+
+def test_data_frame() -> pd.DataFrame:
+    """`test_data` ground truth keyed by its position, matching `predictions` built in the same order."""
+    frame = to_frame([trade['ground_truth'] for trade in test_data])
+    frame.index.name = 'trade_id'
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('predictions')
+    parser.add_argument('ground_truth')
+    parser.add_argument('--key', default='trade_id')
+    parser.add_argument('--out', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = evaluate(pd.read_csv(args.predictions), pd.read_csv(args.ground_truth), key=args.key)
+    payload = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+
+if __name__ == '__main__':
+    main()
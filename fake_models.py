@@ -0,0 +1,197 @@
+"""
+Deterministic local stand-ins for the two chat models used by `predict()`, and for the provider batch
+endpoint used by `bulk`. They never touch the network, so the batch pipeline can be exercised and
+benchmarked offline.
+"""
+import asyncio
+import json
+import math
+import random
+import time
+import zlib
+from contextlib import contextmanager
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+import base
+from base import Swap, test_data
+
+TRADE_MARKER = "##Trade description:"
+
+
+def make_latency(spec=0.0, seed: int = 0):
+    """
+    Seconds-per-call sampler from a number or a spec string:
+    'constant:0.2', 'uniform:0.1,0.5' or 'lognormal:<median>,<sigma>'.
+    """
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda: spec
+    kind, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(',') if value]
+    rng = random.Random(seed)
+    if kind == 'constant':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        return lambda: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution '{kind}'")
+
+
+def canned_swaps() -> dict:
+    swaps = {}
+    for trade in test_data:
+        fields = {k: (None if v is None else str(v)) for k, v in trade['ground_truth'].items()}
+        swaps[trade['trade_description']] = Swap(**fields)
+    return swaps
+
+
+def prompt_text(prompt) -> str:
+    """A plain prompt, or the contents of the chat messages from `base.render_prompt` joined."""
+    return prompt if isinstance(prompt, str) else '\n'.join(content for _, content in prompt)
+
+
+def extract_trade(prompt) -> str:
+    return prompt_text(prompt).rsplit(TRADE_MARKER, 1)[-1].strip()
+
+
+def report_usage(config, model_name: str, prompt, completion: str):
+    """Send the callbacks in `config` a usage report like a real chat model's, with ~4 characters per token."""
+    if not config or not config.get('callbacks'):
+        return
+    input_tokens, output_tokens = len(prompt_text(prompt)) // 4 + 1, len(completion) // 4 + 1
+    message = AIMessage(content=completion, response_metadata={'model_name': model_name}, usage_metadata={
+        'input_tokens': input_tokens, 'output_tokens': output_tokens, 'total_tokens': input_tokens + output_tokens,
+    })
+    for handler in config['callbacks']:
+        handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+
+
+class FakeDescriptionModel:
+    """Stage 1 stand-in: echoes the trade description back as the decomposition."""
+
+    def __init__(self, latency=0.0, model_name: str = "fake-description", temperature: float = 0.5):
+        self.latency = make_latency(latency)
+        self.model_name = model_name
+        self.temperature = temperature
+
+    def invoke(self, prompt, config=None, **kwargs) -> AIMessage:
+        time.sleep(self.latency())
+        report_usage(config, self.model_name, prompt, extract_trade(prompt))
+        return AIMessage(content=extract_trade(prompt))
+
+    async def ainvoke(self, prompt, config=None, **kwargs) -> AIMessage:
+        await asyncio.sleep(self.latency())
+        report_usage(config, self.model_name, prompt, extract_trade(prompt))
+        return AIMessage(content=extract_trade(prompt))
+
+
+class FakeStructuredModel:
+    """
+    Stage 2 stand-in: returns the canned `Swap` for known trades and a stable pick otherwise.
+    With `error_rate`, that fraction of trades (a stable pick) gets a pay leg that is both fixed and floating,
+    which is how the cheaper cascade tier is simulated.
+    """
+
+    def __init__(self, latency=0.0, swaps: dict = None, model_name: str = "fake-structured", temperature: float = 0,
+                 error_rate: float = 0.0):
+        self.latency = make_latency(latency)
+        self.swaps = swaps if swaps is not None else canned_swaps()
+        self.fallback = list(self.swaps.values())
+        self.model_name = model_name
+        self.temperature = temperature
+        self.error_rate = error_rate
+
+    def lookup(self, prompt) -> Swap:
+        trade = extract_trade(prompt)
+        checksum = zlib.crc32(trade.encode())
+        swap = self.swaps[trade] if trade in self.swaps else self.fallback[checksum % len(self.fallback)]
+        if (checksum >> 8) % 1000 < self.error_rate * 1000:
+            return swap.model_copy(update={'PayLegFixedRatePct': '3.0', 'PayLegFloatIndex': 'SOFR'})
+        return swap
+
+    def invoke(self, prompt, config=None, **kwargs) -> Swap:
+        time.sleep(self.latency())
+        swap = self.lookup(prompt)
+        report_usage(config, self.model_name, prompt, swap.model_dump_json())
+        return swap
+
+    async def ainvoke(self, prompt, config=None, **kwargs) -> Swap:
+        await asyncio.sleep(self.latency())
+        swap = self.lookup(prompt)
+        report_usage(config, self.model_name, prompt, swap.model_dump_json())
+        return swap
+
+
+@contextmanager
+def fake_models(latency=0.0, cheap_latency=None, cheap_error_rate: float = 0.0):
+    """
+    Temporarily replace the chat models used by `base` with the fakes.
+    `latency` is anything `make_latency` accepts; each model samples from its own seeded stream.
+    The cheap cascade tier uses `cheap_latency` (default: `latency`) and gets `cheap_error_rate` wrong.
+    """
+    original = {name: vars(base).get(name) for name in base.MODEL_NAMES}
+    base.chat_description = FakeDescriptionModel(latency=make_latency(latency, seed=1))
+    base.structured_model = FakeStructuredModel(latency=make_latency(latency, seed=2))
+    base.single_pass_model = FakeStructuredModel(latency=make_latency(latency, seed=3), model_name="fake-single-pass")
+    base.cheap_model = FakeStructuredModel(latency=make_latency(latency if cheap_latency is None else cheap_latency,
+                                                                seed=4),
+                                           model_name="fake-cheap", error_rate=cheap_error_rate)
+    try:
+        yield base.chat_description, base.structured_model
+    finally:
+        # Models that had not been built yet go back to being built lazily
+        for name, model in original.items():
+            setattr(base, name, model)
+
+
+_installed = []
+
+
+def install_fake_models(*args, **kwargs):
+    """Process pool initializer: use the fakes (same arguments as `fake_models`) for the rest of the process."""
+    context = fake_models(*args, **kwargs)
+    context.__enter__()
+    # Held on to, since collecting the generator would run its cleanup and restore the real models
+    _installed.append(context)
+
+
+def run_fake_batch(requests_path: str, results_path: str, error_rate: float = 0.0, seed: int = 0) -> dict:
+    """
+    Provider stand-in for `bulk`: answers every chat request of a batch request file the way the fake models
+    would and writes a result file in the provider's format, in shuffled order as real batches come back.
+    With `error_rate`, that fraction of requests gets a 500 response instead.
+    """
+    structured = FakeStructuredModel()
+    rng = random.Random(seed)
+    results = []
+    with open(requests_path, encoding='utf-8') as f:
+        for number, line in enumerate(f):
+            request = json.loads(line)
+            body = request['body']
+            prompt = [(message['role'], message['content']) for message in body['messages']]
+            if rng.random() < error_rate:
+                response = {'status_code': 500, 'request_id': f'req_{number}', 'body': {'error': {
+                    'message': "The server had an error processing your request.", 'type': 'server_error'}}}
+            else:
+                structured_output = 'response_format' in body
+                content = structured.lookup(prompt).model_dump_json() if structured_output else extract_trade(prompt)
+                input_tokens, output_tokens = len(prompt_text(prompt)) // 4 + 1, len(content) // 4 + 1
+                response = {'status_code': 200, 'request_id': f'req_{number}', 'body': {
+                    'object': 'chat.completion',
+                    'model': body['model'],
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                                 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': input_tokens, 'completion_tokens': output_tokens,
+                              'total_tokens': input_tokens + output_tokens},
+                }}
+            results.append({'id': f'batch_req_{number}', 'custom_id': request['custom_id'], 'response': response,
+                            'error': None})
+    rng.shuffle(results)
+    with open(results_path, 'w', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(result) + '\n')
+    return {'requests': len(results), 'errors': sum(result['response']['status_code'] != 200 for result in results)}
@@ -0,0 +1,218 @@
+"""
+Rule-based extractor for terse single-currency fixed/float swap shorthand such as
+"Sell 10y SOFR swap at 3.45%" or "We pay 5Y 4.25% vs SOFR on 100mm USD".
+
+The description is lexed into typed tokens. A result is only marked confident when every word is
+accounted for by the grammar and nothing conflicts; anything else falls back to the LLM `predict()`.
+Like the LLM path it fills a `Swap` with string values, so it goes through `parse_swap` unchanged.
+"""
+import re
+from typing import NamedTuple, Optional
+
+from base import Swap, apredict, predict
+
+CURRENCIES = ['USD', 'EUR', 'GBP', 'JPY', 'CHF', 'CAD', 'AUD', 'NZD', 'SEK', 'NOK', 'DKK']
+CURRENCY_SYMBOLS = {'$': 'USD', '£': 'GBP', '¥': 'JPY', '€': 'EUR'}
+INDICES = ['SOFR', '€STR', 'ESTR', 'SONIA', 'EURIBOR', 'SARON', 'TONA', 'TONAR', 'LIBOR', 'CORRA', 'BBSW']
+NOTIONAL_MULTIPLIERS = {
+    'k': 10 ** 3, 'm': 10 ** 6, 'mm': 10 ** 6, 'mln': 10 ** 6, 'million': 10 ** 6,
+    'b': 10 ** 9, 'bn': 10 ** 9, 'billion': 10 ** 9,
+}
+FREQUENCY_MONTHS = {'monthly': 1, 'quarterly': 3, 'semiannual': 6, 'semiannually': 6, 'annual': 12, 'annually': 12}
+
+FILLER_WORDS = {
+    'a', 'an', 'and', 'at', 'bank', 'booked', 'both', 'deal', 'done', 'executed', 'for', 'index', 'interest', 'irs',
+    'is', 'leg', 'legs', 'maturity', 'notional', 'of', 'on', 'plain', 'rate', 'run', 'runs', 'swap', 'swaps', 'tenor',
+    'the', 'trade', 'vanilla', 'versus', 'vs', 'we', 'with',
+}
+FILLER_PUNCTUATION = set(',.;:-–—/()')
+
+_SYMBOLS = ''.join(re.escape(symbol) for symbol in CURRENCY_SYMBOLS)
+# Commas are only read as thousands separators; '1,5bn' could be a decimal comma and is left to the LLM
+_NUMBER = r'\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?'
+TOKEN_PATTERNS = [
+    ('INDEX', r'(?:\d+\s*m\s+)?(?:term\s+)?(?:' + '|'.join(INDICES) + r')\b'),
+    ('RATE', r'\d+(?:\.\d+)?\s*(?:%|percent\b|pct\b)'),
+    ('TENOR', r'\d+(?:\.\d+)?\s*-?\s*(?:years|year|yrs|yr|y)\b'),
+    ('NOTIONAL', rf'(?:[{_SYMBOLS}]\s*)?(?:{_NUMBER})\s*(?:mm|mln|million|bn|billion|m|b|k)\b|[{_SYMBOLS}]\s*(?:{_NUMBER})'),
+    ('BASIS', r'\b(?:actual|act|30e|30)/(?:360|365|actual|act)\b'),
+    ('FREQUENCY', r'\b(?:semi[- ]?annual(?:ly)?|annual(?:ly)?|quarterly|monthly)\b'),
+    ('CCY', r'\b(?:' + '|'.join(CURRENCIES) + r')\b'),
+    ('PAYER', r'\bpayer\b'),
+    ('RECEIVER', r'\breceiver\b'),
+    ('PAY', r'\b(?:pay|pays|paying)\b'),
+    ('RECEIVE', r'\b(?:receive|receives|receiving|rec)\b'),
+    ('BUY', r'\b(?:buy|bought)\b'),
+    ('SELL', r'\b(?:sell|sold)\b'),
+    ('FIXED', r'\bfixed\b'),
+    ('FLOAT', r'\bfloat(?:ing|er)?\b'),
+    ('RESETS', r'\bresets?\b'),
+    ('NUMBER', r'\d+(?:[.,]\d+)*'),
+    ('WORD', r'\w+'),
+    ('PUNCT', r'[^\w\s]'),
+]
+TOKEN_REGEX = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in TOKEN_PATTERNS), re.IGNORECASE)
+
+# Tokens that may sit between a pay/receive verb and the thing being paid ("we pay 5Y 4.25% ...")
+VERB_SKIPPABLE = {'TENOR', 'NOTIONAL', 'CCY'}
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+
+
+class FastPathResult(NamedTuple):
+    swap: Optional[Swap]
+    confident: bool
+    reason: str
+
+
+def tokenize(text: str) -> list:
+    return [Token(match.lastgroup, match.group()) for match in TOKEN_REGEX.finditer(text)]
+
+
+def parse_notional(text: str) -> tuple:
+    """'$300M' -> ('300000000', 'USD'), '100mm' -> ('100000000', None)"""
+    match = re.fullmatch(rf'([{_SYMBOLS}])?\s*({_NUMBER})\s*([a-z]*)', text.strip(), re.IGNORECASE)
+    symbol, number, suffix = match.groups()
+    amount = float(number.replace(',', '')) * NOTIONAL_MULTIPLIERS.get(suffix.lower(), 1)
+    return str(int(round(amount))), CURRENCY_SYMBOLS.get(symbol)
+
+
+def parse_basis(text: str) -> str:
+    month, year = text.lower().split('/')
+    convention = {'act': 'Act', 'actual': 'Act', '30': '30', '30e': '30E'}
+    return f"{convention[month]}/{convention.get(year, year)}"
+
+
+def leg_of_verb(tokens: list, position: int) -> Optional[str]:
+    """Whether the pay/receive verb at `position` refers to the fixed or the floating leg."""
+    for token in tokens[position + 1:]:
+        if token.kind in ('FIXED', 'RATE'):
+            return 'fixed'
+        if token.kind in ('FLOAT', 'INDEX'):
+            return 'float'
+        if token.kind in VERB_SKIPPABLE or token.text.lower() in FILLER_WORDS or token.text == ':':
+            continue
+        return None
+    return None
+
+
+def resolve_direction(tokens: list) -> tuple:
+    """Which leg the bank pays: 'fixed' or 'float'. Returns (direction, reason)."""
+    votes = set()
+    for position, token in enumerate(tokens):
+        if token.kind in ('BUY', 'SELL'):
+            votes.add('fixed' if token.kind == 'BUY' else 'float')
+        elif token.kind in ('PAYER', 'RECEIVER'):
+            previous = tokens[position - 1].kind if position else None
+            if previous not in ('FIXED', 'FLOAT'):
+                return None, f"unqualified '{token.text}'"
+            leg = 'fixed' if previous == 'FIXED' else 'float'
+            paid_is_fixed = (leg == 'fixed') == (token.kind == 'PAYER')
+            votes.add('fixed' if paid_is_fixed else 'float')
+        elif token.kind in ('PAY', 'RECEIVE'):
+            leg = leg_of_verb(tokens, position)
+            if leg is None:
+                return None, f"cannot tell which leg '{token.text}' refers to"
+            paid_is_fixed = (leg == 'fixed') == (token.kind == 'PAY')
+            votes.add('fixed' if paid_is_fixed else 'float')
+    if len(votes) != 1:
+        return None, "direction missing" if not votes else "conflicting direction"
+    return votes.pop(), ''
+
+
+def single(tokens: list, kind: str) -> tuple:
+    """The only token of `kind` (None if absent) and whether the kind was unambiguous."""
+    values = {token.text for token in tokens if token.kind == kind}
+    if len(values) > 1:
+        return None, False
+    return (values.pop() if values else None), True
+
+
+def notional_is_labelled(tokens: list) -> bool:
+    """Whether a currency or the word 'notional' sits right next to the notional ("Notional: 10m", "10m USD")."""
+    position = next(position for position, token in enumerate(tokens) if token.kind == 'NOTIONAL')
+    before = tokens[max(0, position - 2):position]
+    if before and before[-1].text == ':':
+        before = before[:-1]
+    else:
+        before = before[-1:]
+    neighbours = before + tokens[position + 1:position + 2]
+    return any(token.kind == 'CCY' or token.text.lower() == 'notional' for token in neighbours)
+
+
+def extract(text: str) -> FastPathResult:
+    tokens = tokenize(text)
+    for token in tokens:
+        if token.kind == 'WORD' and token.text.lower() not in FILLER_WORDS:
+            return FastPathResult(None, False, f"unrecognised word '{token.text}'")
+        if token.kind == 'PUNCT' and token.text not in FILLER_PUNCTUATION:
+            return FastPathResult(None, False, f"unrecognised symbol '{token.text}'")
+        if token.kind == 'NUMBER':
+            return FastPathResult(None, False, f"unrecognised number '{token.text}'")
+
+    fields = {}
+    for kind in ('RATE', 'INDEX', 'TENOR', 'NOTIONAL', 'BASIS', 'FREQUENCY'):
+        fields[kind], unambiguous = single(tokens, kind)
+        if not unambiguous:
+            return FastPathResult(None, False, f"more than one {kind.lower()}")
+    if fields['RATE'] is None and fields['INDEX'] is None:
+        return FastPathResult(None, False, "neither fixed rate nor index")
+
+    paid_leg, reason = resolve_direction(tokens)
+    if paid_leg is None:
+        return FastPathResult(None, False, reason)
+    fixed, floating = ('PayLeg', 'RecLeg') if paid_leg == 'fixed' else ('RecLeg', 'PayLeg')
+
+    swap = dict.fromkeys(Swap.model_fields)
+    if fields['RATE'] is not None:
+        swap[f'{fixed}FixedRatePct'] = re.match(r'\d+(?:\.\d+)?', fields['RATE']).group()
+    if fields['INDEX'] is not None:
+        swap[f'{floating}FloatIndex'] = fields['INDEX']
+    if fields['TENOR'] is not None:
+        tenor = float(re.match(r'\d+(?:\.\d+)?', fields['TENOR']).group())
+        if not tenor.is_integer():
+            return FastPathResult(None, False, "fractional tenor")
+        swap['TenorYears'] = str(int(tenor))
+
+    currencies = {token.text.upper() for token in tokens if token.kind == 'CCY'}
+    if fields['NOTIONAL'] is not None:
+        notional, currency = parse_notional(fields['NOTIONAL'])
+        # A bare '3m' is as likely a 3-month index or reset as 3 million
+        if (currency is None and re.fullmatch(r'[\d.,\s]+m', fields['NOTIONAL'], re.IGNORECASE)
+                and not notional_is_labelled(tokens)):
+            return FastPathResult(None, False, f"'{fields['NOTIONAL']}' may not be a notional")
+        swap['PayLegNotional'] = swap['RecLegNotional'] = notional
+        if currency is not None:
+            currencies.add(currency)
+    if len(currencies) > 1:
+        return FastPathResult(None, False, "cross-currency")
+    if currencies:
+        swap['PayLegCcy'] = swap['RecLegCcy'] = currencies.pop()
+
+    if fields['BASIS'] is not None:
+        swap['PayLegBasis'] = swap['RecLegBasis'] = parse_basis(fields['BASIS'])
+    if fields['FREQUENCY'] is not None:
+        months = str(FREQUENCY_MONTHS[re.sub(r'[- ]', '', fields['FREQUENCY'].lower())])
+        resets_only = any(token.kind == 'RESETS' for token in tokens)
+        swap[f'{floating}FreqMonths'] = months
+        if not resets_only:
+            swap[f'{fixed}FreqMonths'] = months
+
+    return FastPathResult(Swap(**swap), True, '')
+
+
+def predict_fast(trade, cache=None, fallback=predict) -> Swap:
+    result = extract(trade)
+    if result.confident:
+        return result.swap
+    return fallback(trade, cache=cache)
+
+
+async def apredict_fast(trade, cache=None, fallback=apredict) -> Swap:
+    result = extract(trade)
+    if result.confident:
+        return result.swap
+    return await fallback(trade, cache=cache)
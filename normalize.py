@@ -0,0 +1,145 @@
+"""
+Batch post-processing of raw `Swap` outputs, column-wise instead of one `parse_swap` call per trade.
+
+- numbers are coerced per column, tolerating units the model sometimes leaves in: '3.5' or '5y' tenors,
+  '100mm' / '$1.5bn' / '10,000,000' notionals, '3.45%' rates, '15bps' spreads,
+- a zero or empty spread becomes None, as in `parse_swap`,
+- dates are rewritten as ISO YYYY-MM-DD (the `Swap` descriptions ask the model for MM/DD/YYYY),
+- cells that cannot be parsed become None and are reported in the error list instead of aborting the batch.
+"""
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from base import Swap
+
+FIELDS = list(Swap.model_fields)
+NOTIONAL_FIELDS = ['PayLegNotional', 'RecLegNotional']
+FREQUENCY_FIELDS = ['PayLegFreqMonths', 'RecLegFreqMonths']
+RATE_FIELDS = ['PayLegFixedRatePct', 'RecLegFixedRatePct']
+SPREAD_FIELDS = ['PayLegFloatSpreadBp', 'RecLegFloatSpreadBp']
+DATE_FIELDS = ['EffectiveDate', 'MaturityDate']
+NUMERIC_FIELDS = ['TenorYears'] + NOTIONAL_FIELDS + FREQUENCY_FIELDS + RATE_FIELDS + SPREAD_FIELDS
+INTEGER_FIELDS = NOTIONAL_FIELDS + FREQUENCY_FIELDS
+STRING_FIELDS = [field for field in FIELDS if field not in NUMERIC_FIELDS and field not in DATE_FIELDS]
+
+NUMBER = r'[-+]?(?:\d[\d,]*(?:\.\d+)?|\.\d+)'
+CURRENCY_PREFIX = r'(?:[$£¥€]|USD|EUR|GBP|JPY|CHF)?'
+# Accepted unit suffixes per field kind and the factor each one applies
+UNITS = {
+    'TenorYears': {'': 1, 'y': 1, 'yr': 1, 'yrs': 1, 'year': 1, 'years': 1, 'month': 1 / 12, 'months': 1 / 12},
+    'notional': {'': 1, 'k': 10 ** 3, 'm': 10 ** 6, 'mm': 10 ** 6, 'mln': 10 ** 6, 'million': 10 ** 6,
+                 'b': 10 ** 9, 'bn': 10 ** 9, 'billion': 10 ** 9},
+    'frequency': {'': 1, 'm': 1, 'month': 1, 'months': 1},
+    'rate': {'': 1, '%': 1, 'pct': 1, 'percent': 1},
+    'spread': {'': 1, 'bp': 1, 'bps': 1, 'basis points': 1},
+}
+
+
+def field_units(field: str) -> tuple:
+    """(prefix pattern, unit factors) accepted for `field`."""
+    if field in NOTIONAL_FIELDS:
+        return CURRENCY_PREFIX, UNITS['notional']
+    if field in FREQUENCY_FIELDS:
+        return '', UNITS['frequency']
+    if field in RATE_FIELDS:
+        return '', UNITS['rate']
+    if field in SPREAD_FIELDS:
+        return '', UNITS['spread']
+    return '', UNITS['TenorYears']
+
+
+def number_pattern(prefix: str, units: dict) -> str:
+    suffixes = '|'.join(sorted((unit for unit in units if unit), key=len, reverse=True))
+    return rf'^\s*{prefix}\s*({NUMBER})\s*({suffixes})?\s*$'
+
+
+def parse_number(value, field: str) -> Optional[float]:
+    """Single-value counterpart of `parse_numbers`: None when empty, ValueError when unparseable."""
+    if value is None or str(value).strip() == '':
+        return None
+    prefix, units = field_units(field)
+    match = re.match(number_pattern(prefix, units), str(value), re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"could not parse {field}")
+    return float(match.group(1).replace(',', '')) * units[(match.group(2) or '').lower()]
+
+
+def parse_numbers(values: pd.Series, prefix: str, units: dict) -> pd.Series:
+    # Most cells are plain numbers; only the rest go through the (much slower) unit-aware regex
+    numbers = pd.to_numeric(values, errors='coerce').astype('float64')
+    rest = values[numbers.isna() & values.notna()]
+    if rest.empty:
+        return numbers
+    parts = rest.str.extract(number_pattern(prefix, units), flags=re.IGNORECASE)
+    factors = parts[1].str.lower().fillna('').map(units).astype('float64')
+    numbers[rest.index] = pd.to_numeric(parts[0].str.replace(',', '', regex=False), errors='coerce') * factors
+    return numbers
+
+
+def is_integral(values: pd.Series) -> pd.Series:
+    # Unit factors leave float noise behind: '4.1m' is 4099999.9999999995
+    return pd.Series(np.isclose(values, values.round(), rtol=1e-12, atol=1e-6), index=values.index)
+
+
+def to_frame(swaps) -> pd.DataFrame:
+    if isinstance(swaps, pd.DataFrame):
+        return swaps.reindex(columns=FIELDS)
+    return pd.DataFrame([swap.model_dump() if isinstance(swap, Swap) else swap for swap in swaps], columns=FIELDS)
+
+
+def normalize_swaps(swaps) -> tuple:
+    """
+    Typed frame of `swaps` (a DataFrame, or a list of `Swap`s / dicts) and the list of cells that failed,
+    each as {'row': index label, 'field', 'value', 'error'}.
+    """
+    raw = to_frame(swaps)
+    columns = {}
+    failed = {}
+
+    for field in FIELDS:
+        # Object dtype on purpose: Arrow-backed strings cost more per call than they save on batches this size.
+        # Numbers are cast to text first, so numeric and mixed columns go through the same parsing as strings.
+        column = raw[field]
+        strings = pd.Series(None, index=raw.index, dtype=object)
+        strings[column.notna()] = column[column.notna()].astype(str).str.strip()
+        present = strings.notna() & (strings != '')
+        if not present.any():
+            columns[field] = pd.Series(None, index=raw.index, dtype=object)
+            continue
+        if field in NUMERIC_FIELDS:
+            values = parse_numbers(strings.where(present), *field_units(field))
+            if field in INTEGER_FIELDS:
+                values = values.where(is_integral(values)).round().astype('Int64')
+            failed[field] = present & values.isna()
+            if field in SPREAD_FIELDS:
+                values = values.mask(values == 0)
+            if field == 'TenorYears':
+                # Whole tenors as int and the rest as float, like `parse_swap`
+                integral = is_integral(values)
+                tenors = values.astype(object).where(values.notna(), None)
+                tenors[integral] = values[integral].round().astype('int64').astype(object)
+                values = tenors
+        elif field in DATE_FIELDS:
+            dates = pd.to_datetime(strings.where(present), errors='coerce', format='mixed')
+            failed[field] = present & dates.isna()
+            values = dates.dt.strftime('%Y-%m-%d').astype(object).where(dates.notna(), None)
+        else:
+            values = strings.where(present, None)
+        columns[field] = values
+
+    errors = [
+        {'row': row, 'field': field, 'value': raw.at[row, field], 'error': f"could not parse {field}"}
+        for field, mask in failed.items() if mask.any()
+        for row in raw.index[mask.to_numpy(dtype=bool)]
+    ]
+    return pd.DataFrame(columns, index=raw.index), errors
+
+
+def to_records(normalized: pd.DataFrame) -> list:
+    """Plain dicts with None for missing values, ready for `swap_to_record`."""
+    names = list(normalized.columns)
+    columns = [normalized[name].to_numpy(dtype=object, na_value=None).tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*columns)]
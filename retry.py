@@ -0,0 +1,163 @@
+"""
+Retries with exponential backoff and full jitter, shared by every row of a batch through a circuit breaker.
+
+Errors are sorted into three kinds:
+- service errors (429, 408/409, 5xx, timeouts, dropped connections) are retried and count towards the
+  breaker; a Retry-After header pauses every row, not just the one that got it,
+- malformed structured output is retried, since a fresh sample usually parses, but says nothing about the
+  service and leaves the breaker alone,
+- anything else (bad request, authentication, bugs) fails the row at once.
+"""
+import asyncio
+import email.utils
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+SERVICE_ERRORS = {'APITimeoutError', 'APIConnectionError', 'TimeoutError'}
+OUTPUT_ERRORS = {'OutputParserException', 'ValidationError', 'JSONDecodeError'}
+
+
+def error_names(exc: BaseException) -> set:
+    return {cls.__name__ for cls in type(exc).__mro__}
+
+
+def is_service_error(exc: BaseException) -> bool:
+    status = getattr(exc, 'status_code', None)
+    if status is not None:
+        return status in TRANSIENT_STATUS
+    return bool(error_names(exc) & SERVICE_ERRORS)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return is_service_error(exc) or bool(error_names(exc) & OUTPUT_ERRORS)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, from the Retry-After(-Ms) headers of the error's response."""
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    if headers.get('retry-after-ms') is not None:
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive service errors and holds every caller for `cooldown` seconds.
+    Then a single probe call goes through: its success closes the breaker, its failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opens = 0
+        self.paused_until = 0.0
+        self.state = 'closed'
+        self.probe = None
+
+    async def wait(self):
+        while True:
+            delay = self.paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            if self.state == 'open':
+                self.state = 'half_open'
+                self.probe = asyncio.get_running_loop().create_future()
+                return
+            if self.state == 'half_open' and self.probe is not None:
+                await asyncio.shield(self.probe)
+                continue
+            return
+
+    def _settle_probe(self):
+        if self.probe is not None and not self.probe.done():
+            self.probe.set_result(None)
+        self.probe = None
+
+    def record_success(self):
+        self.failures = 0
+        self.state = 'closed'
+        self._settle_probe()
+
+    def record_failure(self, pause: Optional[float] = None):
+        now = time.monotonic()
+        if pause:
+            self.paused_until = max(self.paused_until, now + pause)
+        self.failures += 1
+        if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+            self.state = 'open'
+            self.opens += 1
+            self.failures = 0
+            self.paused_until = max(self.paused_until, now + self.cooldown)
+            self._settle_probe()
+
+
+class Retrier:
+    """
+    Runs one row's prediction with up to `max_attempts` attempts. Before attempt n + 1 it waits a random delay
+    in [0, min(max_delay, base_delay * 2 ** (n - 1))], or longer if the server sent Retry-After. `timeout` is
+    for the caller to apply to each model call, excluding time spent queueing for a slot or the rate limit.
+    `stats` counts attempts, retries and rows that failed for good.
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 timeout: Optional[float] = 120.0, breaker: Optional[CircuitBreaker] = None,
+                 seed: Optional[int] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.random = random.Random(seed)
+        self.stats = {'attempts': 0, 'retries': 0, 'failed': 0}
+
+    def backoff(self, attempt: int, exc: BaseException) -> float:
+        delay = self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(delay, retry_after(exc) or 0.0)
+
+    async def run(self, make_call: Callable[[], Awaitable], on_retry: Optional[Callable] = None):
+        """
+        Result of `make_call()`, retried on transient errors. `on_retry(attempt, exc, delay)` is called before
+        each retry. The last error is re-raised once the attempts are used up or on a permanent error.
+        `make_call` should await `self.breaker.wait()` once it holds its concurrency slot, right before it
+        calls the service, so that rows queued behind the slot limit are held too while the breaker is open.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            self.stats['attempts'] += 1
+            try:
+                result = await make_call()
+            except Exception as exc:
+                if is_service_error(exc):
+                    self.breaker.record_failure(retry_after(exc))
+                else:
+                    # The service did answer, so this closes the breaker like a success would
+                    self.breaker.record_success()
+                if not is_retryable(exc) or attempt == self.max_attempts:
+                    self.stats['failed'] += 1
+                    raise
+                delay = self.backoff(attempt, exc)
+                self.stats['retries'] += 1
+                if on_retry is not None:
+                    on_retry(attempt, exc, delay)
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    def summary(self) -> dict:
+        return {**self.stats, 'breaker_opens': self.breaker.opens}
@@ -0,0 +1,237 @@
+"""
+Multi-process sharded runs for very large input files.
+
+One process tops out once the per-row Python work (prompt formatting, `Swap` validation, normalization,
+record building) saturates its core, however many requests are in flight. `run_sharded` splits the input
+into contiguous trade_id ranges and predicts each in a worker process with its own models, cache
+connection and rate limiter, each getting an equal share of the global --concurrency, --rpm and --tpm.
+
+Every shard streams into its own checkpointed output under `<output>.shards/`, so an interrupted run
+resumes shard by shard. The layout is recorded there, and resuming with a different shard count or input
+length is refused, since the shards would no longer cover the same trade_ids. Once all shards are done,
+they are merged in trade_id order into `output`, which is rebuilt from the shards on every run. The merge
+streams: each shard holds one sorted run per session that wrote to it, and the runs are merged lazily.
+Workers are spawned rather than forked, so no HTTP client or SQLite connection is shared with the parent.
+"""
+import argparse
+import concurrent.futures
+import csv
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+from typing import Callable, Optional
+
+import pandas as pd
+
+SHARD_DIR_SUFFIX = ".shards"
+LAYOUT_FILE = "layout.json"
+# Rows read at a time from each Parquet part while merging
+MERGE_BATCH_ROWS = 1024
+
+
+def count_rows(input_path: str, chunksize: int = 100000) -> int:
+    # Parsed rather than counted by lines, since entry_text may contain newlines
+    return sum(len(chunk) for chunk in pd.read_csv(input_path, usecols=['entry_text'], chunksize=chunksize))
+
+
+def shard_ranges(rows: int, shards: int) -> list:
+    """`shards` contiguous trade_id ranges covering 0..rows - 1, sizes differing by at most one."""
+    size, extra = divmod(rows, shards)
+    ranges, start = [], 0
+    for shard in range(shards):
+        stop = start + size + (shard < extra)
+        ranges.append(range(start, stop))
+        start = stop
+    return ranges
+
+
+def shard_output(shard_dir: str, shard: int, output_format: str = 'csv') -> str:
+    return os.path.join(shard_dir, f"shard-{shard:03d}" + ('.csv' if output_format == 'csv' else ''))
+
+
+def shard_args(args: argparse.Namespace, shard: int, trade_ids: range, shard_dir: str) -> argparse.Namespace:
+    """The `run` arguments of one worker: its range, its own output and its share of the global limits."""
+    shards = args.shards
+    return argparse.Namespace(**{
+        **vars(args),
+        'output': shard_output(shard_dir, shard, args.format),
+        'trade_ids': trade_ids,
+        'concurrency': max(1, args.concurrency // shards),
+        'rpm': args.rpm / shards if args.rpm else args.rpm,
+        'tpm': args.tpm / shards if args.tpm else args.tpm,
+        'shards': 1,
+        'progress': False,
+    })
+
+
+def run_shard(args: argparse.Namespace) -> dict:
+    from cli import execute
+    return execute(args)
+
+
+def check_layout(shard_dir: str, shards: int, rows: int):
+    """Record the shard count and input length of `shard_dir`, or refuse to resume it with different ones."""
+    path = os.path.join(shard_dir, LAYOUT_FILE)
+    layout = {'shards': shards, 'rows': rows}
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != layout:
+            raise ValueError(f"{shard_dir} holds a run with {previous['shards']} shards over {previous['rows']} "
+                             f"rows, not {shards} over {rows}; rerun with --shards {previous['shards']} on the "
+                             f"same input, or remove {shard_dir} to start over")
+        return
+    with open(path, 'w') as f:
+        json.dump(layout, f)
+
+
+def csv_runs(path: str) -> list:
+    """(first record, record count) of each stretch of `path` already in trade_id order."""
+    from streaming import TRADE_ID_COLUMN
+
+    runs, previous = [], None
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for position, record in enumerate(reader):
+            trade_id = int(record[TRADE_ID_COLUMN])
+            if previous is None or trade_id < previous:
+                runs.append([position, 0])
+            runs[-1][1] += 1
+            previous = trade_id
+    return runs
+
+
+def read_csv_run(path: str, start: int, count: int):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        yield from itertools.islice(reader, start, start + count)
+
+
+def merge_csv(paths: list, output_path: str):
+    """Concatenate shard CSVs into `output_path`, merging each shard's sorted runs (reruns append out of order)."""
+    from streaming import TRADE_ID_COLUMN
+
+    partial_path = output_path + '.tmp'
+    with open(partial_path, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        header_written = False
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, newline='', encoding='utf-8') as f:
+                header = next(csv.reader(f), None)
+            if header is None:
+                continue
+            if not header_written:
+                writer.writerow(header)
+                header_written = True
+            runs = [read_csv_run(path, start, count) for start, count in csv_runs(path)]
+            writer.writerows(heapq.merge(*runs, key=lambda record: int(record[TRADE_ID_COLUMN])))
+    os.replace(partial_path, output_path)
+
+
+def parquet_parts(path: str) -> list:
+    """Part files under `path` as (first trade_id, last trade_id, path), ordered by first trade_id."""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    parts = []
+    names = sorted(name for name in os.listdir(path) if name.endswith('.parquet')) if os.path.isdir(path) else []
+    for name in names:
+        part_path = os.path.join(path, name)
+        bounds = pc.min_max(pq.read_table(part_path, columns=['trade_id']).column('trade_id')).as_py()
+        if bounds['min'] is not None:
+            parts.append((bounds['min'], bounds['max'], part_path))
+    return sorted(parts)
+
+
+def read_parquet_rows(path: str):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=MERGE_BATCH_ROWS):
+        yield from batch.to_pylist()
+
+
+def merge_parquet(paths: list, output_path: str):
+    """
+    Shard parts merged in trade_id order into the part files of `output_path`, replacing the previous merge.
+    Parts are written in trade_id order, so only those whose ranges overlap (from reruns) are merged row by row.
+    """
+    import pyarrow.parquet as pq
+
+    from columnar import ParquetRecordWriter
+
+    os.makedirs(output_path, exist_ok=True)
+    for name in os.listdir(output_path):
+        if name.endswith('.parquet'):
+            os.remove(os.path.join(output_path, name))
+    with ParquetRecordWriter(output_path, sync_seconds=float('inf')) as writer:
+        for path in paths:
+            # Group the parts into clusters of overlapping trade_id ranges
+            clusters = []
+            for first, last, part_path in parquet_parts(path):
+                if clusters and first <= clusters[-1][0]:
+                    clusters[-1][0] = max(clusters[-1][0], last)
+                    clusters[-1][1].append(part_path)
+                else:
+                    clusters.append([last, [part_path]])
+            for _, part_paths in clusters:
+                if len(part_paths) == 1:
+                    # Shard parts are written by `ParquetRecordWriter`, so their batches are in its schema already
+                    for batch in pq.ParquetFile(part_paths[0]).iter_batches(batch_size=MERGE_BATCH_ROWS):
+                        writer.write_batch(batch)
+                    continue
+                runs = [read_parquet_rows(part_path) for part_path in part_paths]
+                for record in heapq.merge(*runs, key=lambda record: record['trade_id']):
+                    writer.write(record)
+
+
+def combine(results: list) -> dict:
+    """Add up the `cli.execute` results of the shards."""
+    cache = None
+    if any(result['cache'] is not None for result in results):
+        cache = {}
+        for result in results:
+            for stage, counts in (result['cache'] or {}).items():
+                totals = cache.setdefault(stage, {})
+                for outcome, count in counts.items():
+                    totals[outcome] = totals.get(outcome, 0) + count
+    retries = {}
+    for result in results:
+        for key, value in result['retries'].items():
+            retries[key] = retries.get(key, 0) + value
+    return {
+        'written': sum(result['written'] for result in results),
+        'skipped': sum(result['skipped'] for result in results),
+        'failed': sum(result['failed'] for result in results),
+        'cell_errors': [error for result in results for error in result['cell_errors']],
+        'dedup': [batch for result in results for batch in result['dedup']],
+        'retries': retries,
+        'cache': cache,
+        'traces': None if results[0]['traces'] is None else [
+            trade for result in results for trade in result['traces']],
+    }
+
+
+def run_sharded(args: argparse.Namespace, initializer: Optional[Callable] = None, initargs: tuple = ()) -> dict:
+    """
+    `cli.execute(args)` split over `args.shards` worker processes, then merged into `args.output`.
+    `initializer(*initargs)` runs first in every worker, e.g. `fake_models.install_fake_models`.
+    """
+    shard_dir = args.output.rstrip('/') + SHARD_DIR_SUFFIX
+    os.makedirs(shard_dir, exist_ok=True)
+    rows = count_rows(args.input)
+    check_layout(shard_dir, args.shards, rows)
+    shards = [shard_args(args, shard, trade_ids, shard_dir)
+              for shard, trade_ids in enumerate(shard_ranges(rows, args.shards))]
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=len(shards), mp_context=context,
+                                                initializer=initializer, initargs=initargs) as pool:
+        results = list(pool.map(run_shard, shards))
+    merge = merge_parquet if args.format == 'parquet' else merge_csv
+    merge([shard.output for shard in shards], args.output)
+    return {**combine(results), 'shard_dir': shard_dir}
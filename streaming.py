@@ -0,0 +1,178 @@
+"""
+Streaming, checkpointed batch runs.
+
+The input CSV is read in chunks and every finished record is appended to a separate output, in trade_id
+order: a CSV with a periodic fsync, or a directory of Parquet parts (see `columnar`). On restart the
+trade_ids already present in the output are skipped, and rows sent to the dead-letter file are tried again.
+A crash loses the rows that were in flight plus, for CSV, those written since the last fsync (at most
+`fsync_every`) or, for Parquet, those in the unfinished part (at most `sync_seconds` of output). Memory is
+bounded by the chunk size plus the set of completed trade_ids.
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+from typing import Optional
+
+import pandas as pd
+
+from base import Swap, swap_to_record
+from engine import apredict_rows
+
+RECORD_COLUMNS = list(swap_to_record(dict.fromkeys(Swap.model_fields), None, None))
+TRADE_ID_COLUMN = RECORD_COLUMNS.index('trade_id')
+
+
+def scan_checkpoint(path: str) -> tuple:
+    """
+    Completed trade_ids of an output CSV and the byte length of its last complete record.
+    A record only ends on a newline outside quotes; entry_text may contain newlines of its own.
+    """
+    done = set()
+    complete_length = 0
+    if not os.path.exists(path):
+        return done, complete_length
+    with open(path, 'rb') as f:
+        record, quotes, offset, is_header = [], 0, 0, True
+        for line in f:
+            offset += len(line)
+            record.append(line)
+            quotes += line.count(b'"')
+            if quotes % 2 or not line.endswith(b'\n'):
+                continue
+            text = b''.join(record).decode('utf-8-sig')
+            record, quotes = [], 0
+            complete_length = offset
+            if is_header:
+                is_header = False
+                continue
+            fields = next(csv.reader(io.StringIO(text)))
+            done.add(int(fields[TRADE_ID_COLUMN]))
+    return done, complete_length
+
+
+class CheckpointedCsvWriter:
+    """Appends records to a CSV, flushing and fsyncing every `fsync_every` rows and on close."""
+
+    def __init__(self, path: str, fsync_every: int = 100, complete_length: Optional[int] = None):
+        exists = os.path.exists(path)
+        if exists and complete_length is not None and os.path.getsize(path) > complete_length:
+            # Drop a record that was only partially written when the previous run died
+            with open(path, 'r+b') as f:
+                f.truncate(complete_length)
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=RECORD_COLUMNS)
+        if not exists or os.path.getsize(path) == 0:
+            self.writer.writeheader()
+        self.fsync_every = fsync_every
+        self.pending = 0
+        self.written = 0
+
+    def write(self, record: dict):
+        self.writer.writerow(record)
+        self.written += 1
+        self.pending += 1
+        if self.pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_output(path: str, output_format: str = 'csv', fsync_every: int = 100,
+                sync_seconds: float = 30.0) -> tuple:
+    """Writer appending to `path` in `output_format` ('csv' or 'parquet') and the trade_ids it already holds."""
+    if output_format == 'parquet':
+        from columnar import ParquetRecordWriter, completed_trade_ids
+        return ParquetRecordWriter(path, sync_seconds=sync_seconds), completed_trade_ids(path)
+    if output_format != 'csv':
+        raise ValueError(f"Unknown output format '{output_format}'")
+    done, complete_length = scan_checkpoint(path)
+    return CheckpointedCsvWriter(path, fsync_every, complete_length), done
+
+
+def dead_letter_path(path: str) -> str:
+    return f"{path.rstrip('/')}.dead_letter.jsonl"
+
+
+class DeadLetterWriter:
+    """
+    Writes rows that failed for good to a JSONL file, flushed per row; they are retried on the next run.
+    The next run tries every missing row again, so a file left by an earlier run is removed up front and
+    the file only lists this run's failures. It is only created once there is something to write.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+        self.written = 0
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, failure: dict):
+        if self.file is None:
+            self.file = open(self.path, 'w', encoding='utf-8')
+        self.file.write(json.dumps(failure, default=str) + '\n')
+        self.file.flush()
+        self.written += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+async def arun_streaming(input_path: str, output_path: str, chunksize: int = 1000, fsync_every: int = 100,
+                         sync_seconds: float = 30.0, output_format: str = 'csv',
+                         dead_letter_path: Optional[str] = None, trade_ids: Optional[range] = None,
+                         **engine_kwargs) -> dict:
+    """
+    Predict every row of `input_path` not yet present in `output_path`. Extra kwargs go to `apredict_rows`.
+    Rows flow through one sliding window of `chunksize` rows across chunk boundaries, so a row in backoff only
+    holds up the run once `chunksize` rows have piled up behind it.
+    With `dead_letter_path`, rows whose prediction fails are written there and the run carries on.
+    With `trade_ids`, rows outside that range are ignored, as a shard of a larger run (see `sharding`).
+    """
+    writer, done = open_output(output_path, output_format, fsync_every, sync_seconds)
+    dead_letters = DeadLetterWriter(dead_letter_path) if dead_letter_path else None
+    skipped = 0
+    cell_errors = []
+    dedup_stats = []
+
+    def pending_rows():
+        nonlocal skipped
+        for chunk in pd.read_csv(input_path, chunksize=chunksize):
+            if trade_ids is not None:
+                if chunk.index[0] >= trade_ids.stop:
+                    break
+                chunk = chunk.loc[(chunk.index >= trade_ids.start) & (chunk.index < trade_ids.stop)]
+            rows = [(index, text) for index, text in chunk['entry_text'].items() if index not in done]
+            skipped += len(chunk) - len(rows)
+            yield from rows
+
+    try:
+        with writer:
+            await apredict_rows(pending_rows(), on_record=writer.write, errors=cell_errors, dedup_stats=dedup_stats,
+                                on_failure=dead_letters.write if dead_letters is not None else None,
+                                **{'window': chunksize, **engine_kwargs})
+    finally:
+        if dead_letters is not None:
+            dead_letters.close()
+    return {'written': writer.written, 'skipped': skipped, 'cell_errors': cell_errors, 'dedup': dedup_stats,
+            'failed': dead_letters.written if dead_letters is not None else 0}
+
+
+def run_streaming(input_path: str, output_path: str, **kwargs) -> dict:
+    return asyncio.run(arun_streaming(input_path, output_path, **kwargs))
@@ -0,0 +1,35 @@
+import pytest
+
+from fast_path import extract
+
+
+@pytest.mark.parametrize('text', [
+    "Pay 3.2% USD vs SOFR 3m, 5y",
+    "USD 5y pay fixed 3% vs SOFR, resets 3m",
+    "Pay fixed 3.2% vs 3m, 5y",
+    "Pay fixed 3.2% on EUR 1,5bn 5y vs ESTR",
+])
+def test_ambiguous_amounts_fall_back(text):
+    result = extract(text)
+    assert not result.confident
+    assert result.swap is None
+
+
+@pytest.mark.parametrize('text, notional, currency', [
+    ("Pay fixed 3.2% vs SOFR 5y, 10m notional", '10000000', None),
+    ("Pay fixed 3.2% vs SOFR 5y, notional: 10m", '10000000', None),
+    ("Pay fixed 3.2% vs SOFR 5y on 10m USD", '10000000', 'USD'),
+    ("Pay fixed 3.2% vs SOFR 5y on $10m", '10000000', 'USD'),
+    ("We pay 5Y 4.25% vs SOFR on 100mm USD", '100000000', 'USD'),
+    ("Pay fixed 3.2% vs SOFR 5y on USD 1,500m", '1500000000', 'USD'),
+])
+def test_labelled_notionals(text, notional, currency):
+    result = extract(text)
+    assert result.confident
+    assert (result.swap.PayLegNotional, result.swap.RecLegNotional) == (notional, notional)
+    assert result.swap.PayLegCcy == currency
+
+
+def test_direction_and_legs():
+    swap = extract("Sell 10y SOFR swap at 3.45%").swap
+    assert (swap.RecLegFixedRatePct, swap.PayLegFloatIndex, swap.TenorYears) == ('3.45', 'SOFR', '10')
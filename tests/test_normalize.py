@@ -0,0 +1,33 @@
+import pandas as pd
+
+from normalize import normalize_swaps, to_records
+
+
+def test_numeric_columns():
+    normalized, errors = normalize_swaps(pd.DataFrame({'TenorYears': [5, 10], 'PayLegNotional': [1e7, '4.1m']}))
+    assert normalized['TenorYears'].tolist() == [5, 10]
+    assert normalized['PayLegNotional'].tolist() == [10000000, 4100000]
+    assert errors == []
+
+
+def test_mixed_columns_keep_every_valid_value():
+    swaps = pd.DataFrame({'TenorYears': ['5', 10, None, '7y', 'soon'], 'PayLegFreqMonths': [3, '6m', None, 12.0, None]})
+    normalized, errors = normalize_swaps(swaps)
+    records = to_records(normalized)
+    assert [record['TenorYears'] for record in records] == [5, 10, None, 7, None]
+    assert [record['PayLegFreqMonths'] for record in records] == [3, 6, None, 12, None]
+    assert errors == [{'row': 4, 'field': 'TenorYears', 'value': 'soon', 'error': "could not parse TenorYears"}]
+
+
+def test_dicts_with_parsed_values():
+    normalized, errors = normalize_swaps([{'TenorYears': 10, 'RecLegFixedRatePct': 3.45, 'RecLegFloatSpreadBp': 0}])
+    record = to_records(normalized)[0]
+    assert (record['TenorYears'], record['RecLegFixedRatePct'], record['RecLegFloatSpreadBp']) == (10, 3.45, None)
+    assert errors == []
+
+
+def test_tenors_keep_the_parse_swap_format():
+    records = to_records(normalize_swaps([{'TenorYears': '10'}, {'TenorYears': '2.5y'}, {'TenorYears': 7.0}])[0])
+    tenors = [record['TenorYears'] for record in records]
+    assert tenors == [10, 2.5, 7]
+    assert [type(tenor) for tenor in tenors] == [int, float, int]
@@ -0,0 +1,230 @@
+"""
+Per-trade tracing of the LLM stages: wall time, prompt/completion tokens, errors and cache status, plus the
+retries and final error of each prediction.
+
+A `Tracer` is passed to `engine.apredict_rows`, which opens one `TradeTrace` per prediction and makes it
+current through a context variable. The model calls in `base` go through `invoke` / `ainvoke` below, and
+`ResponseCache` reports its hits and misses with `record_cache`, so both land in the current trace. Token
+counts come from the models' usage metadata through a langchain callback. Every finished trace is written
+as one JSON line, and `Tracer.summary` aggregates them.
+
+`ainvoke` also waits on the current rate limiter, if `engine.apredict_rows` set one, just before the call
+goes out, and that wait counts as waiting for a slot in the trace. The call itself is then bounded by the
+current timeout.
+
+With no current trace, the helpers forward the call straight to the model. This module imports nothing
+heavy, so `base` stays cheap to import.
+"""
+import asyncio
+import json
+import statistics
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+# USD per million (input, output) tokens; versioned names such as 'gpt-4o-2024-08-06' match by prefix
+MODEL_PRICES = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+}
+PERCENTILES = (50, 95, 99)
+
+current_trace: ContextVar[Optional['TradeTrace']] = ContextVar('current_trace', default=None)
+# Limiter every async model call waits on (an `engine.RateLimiter`), so cache hits and calls skipped by the
+# fast path use up none of the requests- and tokens-per-minute budget
+current_rate_limiter: ContextVar[Optional[object]] = ContextVar('current_rate_limiter', default=None)
+# Seconds allowed for each async model call, not counting the wait for the rate limiter
+current_timeout: ContextVar[Optional[float]] = ContextVar('current_timeout', default=None)
+
+
+def model_price(model_name: str) -> Optional[tuple]:
+    for prefix in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model_name.startswith(prefix):
+            return MODEL_PRICES[prefix]
+    return None
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    if len(values) == 1:
+        return {f'p{p}': values[0] for p in PERCENTILES}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {f'p{p}': cuts[p - 1] for p in PERCENTILES}
+
+
+class TradeTrace:
+    """Stages of one prediction, keyed by stage name, plus the time spent waiting for a slot and its retries."""
+
+    def __init__(self, trade_ids: list):
+        self.trade_ids = trade_ids
+        self.started = time.perf_counter()
+        self.wait_seconds = 0.0
+        self.seconds = None
+        self.retries = 0
+        self.error = None
+        self.stages = {}
+
+    def stage(self, name: str) -> dict:
+        return self.stages.setdefault(name, {
+            'cache': 'disabled', 'calls': 0, 'errors': 0, 'seconds': 0.0, 'models': [],
+            'prompt_tokens': 0, 'completion_tokens': 0, 'cost': 0.0,
+        })
+
+    def record_usage(self, name: str, usage_metadata: dict):
+        entry = self.stage(name)
+        for model_name, usage in usage_metadata.items():
+            prompt_tokens, completion_tokens = usage.get('input_tokens', 0), usage.get('output_tokens', 0)
+            entry['prompt_tokens'] += prompt_tokens
+            entry['completion_tokens'] += completion_tokens
+            if model_name not in entry['models']:
+                entry['models'].append(model_name)
+            price = model_price(model_name)
+            if price is not None:
+                entry['cost'] += (prompt_tokens * price[0] + completion_tokens * price[1]) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            'trade_ids': self.trade_ids,
+            'seconds': self.seconds,
+            'wait_seconds': self.wait_seconds,
+            'prompt_tokens': sum(stage['prompt_tokens'] for stage in self.stages.values()),
+            'completion_tokens': sum(stage['completion_tokens'] for stage in self.stages.values()),
+            'retries': self.retries,
+            'error': self.error,
+            'cost': sum(stage['cost'] for stage in self.stages.values()),
+            'stages': self.stages,
+        }
+
+
+class Tracer:
+    """Collects finished `TradeTrace`s, appending each to the JSONL file at `path` if one is given."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.file = open(path, 'a', encoding='utf-8') if path else None
+        self.trades = []
+
+    def start(self, trade_ids: list) -> TradeTrace:
+        return TradeTrace(list(trade_ids))
+
+    def finish(self, trace: TradeTrace):
+        trace.seconds = time.perf_counter() - trace.started
+        record = trace.to_dict()
+        self.trades.append(record)
+        if self.file is not None:
+            self.file.write(json.dumps(record, default=str) + '\n')
+
+    def summary(self) -> dict:
+        return summarize(self.trades)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def summarize(trades: list) -> dict:
+    """Aggregate of finished trace records, e.g. `Tracer.trades` or those of several tracers combined."""
+    stages = {}
+    for trade in trades:
+        for name, stage in trade['stages'].items():
+            totals = stages.setdefault(name, {'seconds': [], 'prompt_tokens': 0, 'completion_tokens': 0,
+                                              'errors': 0, 'cost': 0.0, 'cache': {}})
+            if stage['calls']:
+                totals['seconds'].append(stage['seconds'])
+            for key in ('prompt_tokens', 'completion_tokens', 'errors', 'cost'):
+                totals[key] += stage[key]
+            totals['cache'][stage['cache']] = totals['cache'].get(stage['cache'], 0) + 1
+    for totals in stages.values():
+        totals['calls'] = len(totals['seconds'])
+        totals['seconds'] = percentiles(totals['seconds'])
+    return {
+        'predictions': len(trades),
+        'rows': sum(len(trade['trade_ids']) for trade in trades),
+        'seconds': percentiles([trade['seconds'] for trade in trades]),
+        'wait_seconds': percentiles([trade['wait_seconds'] for trade in trades]),
+        'prompt_tokens': sum(trade['prompt_tokens'] for trade in trades),
+        'completion_tokens': sum(trade['completion_tokens'] for trade in trades),
+        'retries': sum(trade['retries'] for trade in trades),
+        'rows_with_retries': sum(len(trade['trade_ids']) for trade in trades if trade['retries']),
+        'failed_rows': sum(len(trade['trade_ids']) for trade in trades if trade['error']),
+        'estimated_cost': sum(trade['cost'] for trade in trades),
+        'stages': stages,
+    }
+
+
+def format_summary(summary: dict) -> str:
+    def seconds(values):
+        return ' '.join(f"{name} {value:.2f}s" for name, value in values.items()) or 'n/a'
+
+    lines = [
+        f"Trace: {summary['predictions']} predictions for {summary['rows']} rows, "
+        f"{summary['prompt_tokens']} prompt + {summary['completion_tokens']} completion tokens, "
+        f"estimated cost ${summary['estimated_cost']:.4f}, {summary['retries']} retries "
+        f"({summary['rows_with_retries']} rows), {summary['failed_rows']} rows failed",
+        f"  per prediction: {seconds(summary['seconds'])}, waiting for a slot: {seconds(summary['wait_seconds'])}",
+    ]
+    for name, stage in summary['stages'].items():
+        cache = ', '.join(f"{count} {status}" for status, count in stage['cache'].items())
+        lines.append(f"  {name:<12} {stage['calls']} calls, {seconds(stage['seconds'])}, "
+                     f"{stage['errors']} errors, {stage['prompt_tokens']}+{stage['completion_tokens']} tokens, "
+                     f"${stage['cost']:.4f}, cache: {cache}")
+    return '\n'.join(lines)
+
+
+def record_cache(stage: str, hit: bool):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.stage(stage)['cache'] = 'hit' if hit else 'miss'
+
+
+def _usage_handler():
+    from langchain_core.callbacks import UsageMetadataCallbackHandler
+    return UsageMetadataCallbackHandler()
+
+
+def invoke(model, prompt, stage: str):
+    trace = current_trace.get()
+    if trace is None:
+        return model.invoke(prompt)
+    handler = _usage_handler()
+    start = time.perf_counter()
+    try:
+        return model.invoke(prompt, config={'callbacks': [handler]})
+    except Exception:
+        trace.stage(stage)['errors'] += 1
+        raise
+    finally:
+        entry = trace.stage(stage)
+        entry['calls'] += 1
+        entry['seconds'] += time.perf_counter() - start
+        trace.record_usage(stage, handler.usage_metadata)
+
+
+async def acquire(prompt, stage: str, trace: Optional[TradeTrace]):
+    limiter = current_rate_limiter.get()
+    if limiter is None:
+        return
+    start = time.perf_counter()
+    await limiter.acquire_call(prompt, stage)
+    if trace is not None:
+        trace.wait_seconds += time.perf_counter() - start
+
+
+async def ainvoke(model, prompt, stage: str):
+    trace = current_trace.get()
+    await acquire(prompt, stage, trace)
+    timeout = current_timeout.get()
+    if trace is None:
+        return await asyncio.wait_for(model.ainvoke(prompt), timeout)
+    handler = _usage_handler()
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(model.ainvoke(prompt, config={'callbacks': [handler]}), timeout)
+    except Exception:
+        trace.stage(stage)['errors'] += 1
+        raise
+    finally:
+        entry = trace.stage(stage)
+        entry['calls'] += 1
+        entry['seconds'] += time.perf_counter() - start
+        trace.record_usage(stage, handler.usage_metadata)